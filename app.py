@@ -1,17 +1,163 @@
-from flask import Flask, request, jsonify, render_template_string, send_file
+from flask import Flask, request, jsonify, g, Response, stream_with_context, send_file, send_from_directory, has_request_context
 import sqlite3
 import json
-from datetime import datetime
+import operator
+from datetime import datetime, timezone
 import io
+import functools
+import os
+import base64
+import csv
+import zlib
+import hashlib
+import mimetypes
+import secrets
+import time
+import atexit
+import threading
+import queue
+import asyncio
+import re
+import random
+import itertools
+import sys
+from collections import Counter, OrderedDict, deque
+from urllib.parse import parse_qsl
+from concurrent.futures import Future, ThreadPoolExecutor
+from flask.json.provider import DefaultJSONProvider
+from metrics import Registry, SIZE_BUCKETS
 
-app = Flask(__name__)
-DATABASE = 'students.db'
+try:
+    import brotli
+except ImportError:     # optional; responses fall back to gzip
+    brotli = None
 
-# Initialize database
-def init_db():
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-    cursor.execute('''
+try:
+    import orjson
+except ImportError:     # optional; the json module is used instead
+    orjson = None
+
+# static/ is served from memory by static_file() below, not by Flask
+app = Flask(__name__, static_folder=None)
+DATABASE = os.environ.get('DATABASE', 'students.db')
+
+# SQLite tuning, applied to every pooled connection. WAL lets readers keep
+# going while a writer holds the lock; override any of these before the
+# first request is served.
+app.config.update(
+    SQLITE_PRAGMAS={
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -20000,       # KiB when negative, i.e. ~20 MB page cache
+        'mmap_size': 268435456,     # 256 MB
+        'busy_timeout': 5000,       # ms
+        'temp_store': 'MEMORY',
+    },
+    SQLITE_CACHED_STATEMENTS=256,
+    PAGE_DEFAULT_LIMIT=100,
+    PAGE_MAX_LIMIT=1000,
+    STREAM_BATCH_SIZE=500,
+    IMPORT_BATCH_SIZE=1000,
+    IMPORT_MAX_ERRORS=1000,
+    SEARCH_DEFAULT_LIMIT=100,
+    READ_CACHE_MAX_ENTRIES=2048,
+    READ_CACHE_MAX_BYTES=32 * 1024 * 1024,
+    READ_CACHE_TTL=30,              # seconds
+    BATCH_MAX_OPERATIONS=1000,
+    GROUP_COMMIT=os.environ.get('GROUP_COMMIT', '') in ('1', 'true'),
+    GROUP_COMMIT_MAX_DELAY=0.002,   # seconds
+    GROUP_COMMIT_MAX_BATCH=64,
+    AUTO_MIGRATE=os.environ.get('AUTO_MIGRATE', '1') in ('1', 'true'),
+    CHANGES_LIMIT=500,
+    CHANGES_POLL_INTERVAL=0.5,      # seconds between change_notifier's checks
+    CHANGES_MAX_WAIT=25,            # longest long-poll, seconds
+    SSE_HEARTBEAT=15,               # seconds
+    SSE_MAX_DURATION=300,           # seconds; EventSource reconnects itself
+    # How the bundled UI follows changes: 'poll' (short polls, fine on sync
+    # workers) or 'sse' (one held connection per tab; needs gthread/gevent
+    # workers or similar to spare)
+    LIVE_UPDATES=os.environ.get('LIVE_UPDATES', 'poll'),
+    COMPRESS_MIN_SIZE=1024,         # bytes; smaller JSON bodies go out as is
+    GZIP_LEVEL=6,
+    BROTLI_QUALITY=5,
+    STATIC_MAX_AGE=31536000,        # seconds, for content-hashed asset URLs
+    # 'auto' uses orjson (if installed) and SQLite's json_object() (if
+    # available); 'stdlib' forces the json module and the Python row encoder
+    JSON_ENCODER=os.environ.get('JSON_ENCODER', 'auto'),
+    JOB_WORKERS=2,
+    JOB_DIR=os.environ.get('JOB_DIR'),   # default: <DATABASE>-jobs
+    JOB_RETENTION=3600,             # seconds a finished job is kept
+    JOB_MAX_BYTES=2 * 1024 ** 3,    # finished export files, all jobs
+    JOB_PROGRESS_INTERVAL=0.5,      # seconds between progress writes
+    # Slow log (per process, newest first on /debug/slow): statements and
+    # requests at or over these thresholds, in seconds
+    SLOW_QUERY_THRESHOLD=float(os.environ.get('SLOW_QUERY_THRESHOLD', 0.1)),
+    SLOW_REQUEST_THRESHOLD=float(os.environ.get('SLOW_REQUEST_THRESHOLD', 1.0)),
+    SLOW_LOG_SIZE=200,
+    # Sampling profiler: a fraction of requests, plus any request sent with
+    # an X-Profile header matching PROFILE_TOKEN. The token also guards the
+    # /debug endpoints; while it is unset they and the header are disabled.
+    PROFILE_SAMPLE_RATE=float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+    PROFILE_TOKEN=os.environ.get('PROFILE_TOKEN'),
+    PROFILE_INTERVAL=0.005,         # seconds between stack samples
+    PROFILE_DIR=os.environ.get('PROFILE_DIR'),   # default: <DATABASE>-profiles
+    PROFILE_MAX_FILES=100,
+    # Admission control, per process: at most *_CONCURRENCY requests of a
+    # kind run at once, up to *_QUEUE_DEPTH more wait up to *_QUEUE_TIMEOUT
+    # seconds for a slot, and the rest get 503 with Retry-After. Keep
+    # WRITE_CONCURRENCY + WRITE_QUEUE_DEPTH under the worker's thread count
+    # so a write burst can't take every thread. 0 means no limit.
+    READ_CONCURRENCY=int(os.environ.get('READ_CONCURRENCY', 32)),
+    READ_QUEUE_DEPTH=int(os.environ.get('READ_QUEUE_DEPTH', 64)),
+    READ_QUEUE_TIMEOUT=float(os.environ.get('READ_QUEUE_TIMEOUT', 5)),
+    WRITE_CONCURRENCY=int(os.environ.get('WRITE_CONCURRENCY', 2)),
+    WRITE_QUEUE_DEPTH=int(os.environ.get('WRITE_QUEUE_DEPTH', 8)),
+    WRITE_QUEUE_TIMEOUT=float(os.environ.get('WRITE_QUEUE_TIMEOUT', 2)),
+    # The write lock is retried with jittered backoff for up to
+    # WRITE_LOCK_TIMEOUT seconds, each attempt waiting WRITE_BUSY_TIMEOUT
+    # inside SQLite, sleeps doubling up to WRITE_BACKOFF_MAX
+    WRITE_LOCK_TIMEOUT=float(os.environ.get('WRITE_LOCK_TIMEOUT', 5)),
+    WRITE_BUSY_TIMEOUT=0.01,
+    WRITE_BACKOFF_MAX=0.2,
+    RETRY_AFTER=1,                  # seconds, on 503
+    MIGRATION_LOCK_TIMEOUT=float(os.environ.get('MIGRATION_LOCK_TIMEOUT', 600)),
+)
+
+# Group commit writers wait in the writer's queue, not on the lock, and
+# the more of them there are the fuller each batch
+if app.config['GROUP_COMMIT'] and 'WRITE_CONCURRENCY' not in os.environ:
+    app.config['WRITE_CONCURRENCY'] = app.config['GROUP_COMMIT_MAX_BATCH']
+
+# JSON documents: orjson when installed, else a compact json encoder. No
+# whitespace and no key sorting either way. jsonify() and
+# request.get_json() go through the same pair via FastJSONProvider.
+if orjson is not None and app.config['JSON_ENCODER'] != 'stdlib':
+    def json_dumps(obj):
+        return orjson.dumps(obj, default=DefaultJSONProvider.default,
+                            option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    json_loads = orjson.loads
+else:
+    json_dumps = json.JSONEncoder(separators=(',', ':'), default=DefaultJSONProvider.default).encode
+    json_loads = json.loads
+
+class FastJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        return super().dumps(obj, **kwargs) if kwargs else json_dumps(obj)
+    
+    def loads(self, s, **kwargs):
+        return super().loads(s, **kwargs) if kwargs else json_loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(f'{json_dumps(obj)}\n', mimetype=self.mimetype)
+
+app.json = FastJSONProvider(app)
+
+# Schema migrations. Each entry runs exactly once, in order; the number of
+# applied migrations is kept in PRAGMA user_version. Append new ones at the
+# end and never edit or reorder applied ones.
+def _create_students_table(conn):
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS students (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT NOT NULL,
@@ -21,15 +167,1613 @@ def init_db():
             date_registered TEXT NOT NULL
         )
     ''')
-    conn.commit()
-    conn.close()
 
-# Helper function to get db connection
-def get_db():
-    conn = sqlite3.connect(DATABASE)
+def _create_search_index_if_supported(conn):
+    conn.execute('SAVEPOINT search_index')
+    try:
+        create_search_index(conn)
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5 / trigram: search falls back to LIKE
+        conn.execute('ROLLBACK TO search_index')
+    conn.execute('RELEASE search_index')
+
+def _create_query_indexes(conn):
+    execute_script(conn, '''
+        CREATE INDEX IF NOT EXISTS idx_students_name_nocase ON students (name COLLATE NOCASE);
+        CREATE INDEX IF NOT EXISTS idx_students_grade_section ON students (grade, section);
+        CREATE INDEX IF NOT EXISTS idx_students_date_registered ON students (date_registered);
+        ANALYZE;
+    ''')
+
+MIGRATIONS = [
+    _create_students_table,
+    lambda conn: create_version_tracking(conn),
+    lambda conn: create_stats_tables(conn),
+    _create_search_index_if_supported,
+    _create_query_indexes,
+    lambda conn: create_change_log(conn),
+    lambda conn: create_jobs_table(conn),
+]
+
+# executescript() commits first, which would break the migration
+# transaction, so scripts are split into complete statements and run one
+# by one (trigger bodies contain semicolons of their own).
+def execute_script(conn, script):
+    statement = ''
+    for part in script.split(';'):
+        statement += part + ';'
+        if sqlite3.complete_statement(statement):
+            if statement.strip(' \n;'):
+                conn.execute(statement)
+            statement = ''
+
+# Initialize database: apply pending migrations. Safe to run from several
+# gunicorn workers at once - BEGIN IMMEDIATE lets one of them migrate while
+# the others wait for the lock (up to MIGRATION_LOCK_TIMEOUT, since a big
+# migration runs well past busy_timeout), then find nothing left to do.
+def init_db():
+    conn = _connect()
+    try:
+        if conn.execute('PRAGMA user_version').fetchone()[0] < len(MIGRATIONS):
+            try:
+                begin_write(conn, app.config['MIGRATION_LOCK_TIMEOUT'])
+            except Overloaded:
+                # Still locked; fine if whoever holds it has migrated by now
+                if conn.execute('PRAGMA user_version').fetchone()[0] < len(MIGRATIONS):
+                    raise
+                return
+            try:
+                applied = conn.execute('PRAGMA user_version').fetchone()[0]
+                for version, migration in enumerate(MIGRATIONS[applied:], applied + 1):
+                    migration(conn)
+                    conn.execute(f'PRAGMA user_version = {version}')
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        try:
+            conn.execute('PRAGMA optimize')
+        except sqlite3.OperationalError:
+            pass    # best effort; busy with other workers' writes
+    finally:
+        conn.close()
+
+# Data versioning: a single global counter bumped by every write to
+# students (used for collection ETags), plus a per-row version that counts
+# updates to that student. Writers may bump the row version themselves;
+# the trigger only steps in when they didn't.
+def create_version_tracking(conn):
+    columns = {row['name'] for row in conn.execute('PRAGMA table_info(students)')}
+    if 'version' not in columns:
+        conn.execute('ALTER TABLE students ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+    execute_script(conn, '''
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL,
+            modified INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO data_version (id, version, modified)
+            VALUES (1, 1, CAST(strftime('%s', 'now') AS INTEGER));
+        CREATE TRIGGER IF NOT EXISTS data_version_ai AFTER INSERT ON students BEGIN
+            UPDATE data_version
+            SET version = version + 1, modified = CAST(strftime('%s', 'now') AS INTEGER)
+            WHERE id = 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS data_version_ad AFTER DELETE ON students BEGIN
+            UPDATE data_version
+            SET version = version + 1, modified = CAST(strftime('%s', 'now') AS INTEGER)
+            WHERE id = 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS data_version_au
+        AFTER UPDATE OF name, grade, section, contact, date_registered ON students BEGIN
+            UPDATE data_version
+            SET version = version + 1, modified = CAST(strftime('%s', 'now') AS INTEGER)
+            WHERE id = 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS row_version_au
+        AFTER UPDATE OF name, grade, section, contact, date_registered ON students
+        WHEN new.version = old.version BEGIN
+            UPDATE students SET version = old.version + 1 WHERE id = new.id;
+        END;
+    ''')
+
+# Change log: one row per insert/update/delete of a student, appended by
+# triggers and trimmed to the newest CHANGE_LOG_RETENTION entries. It
+# feeds /students/changes so clients can apply diffs instead of
+# refetching the roster.
+CHANGE_LOG_RETENTION = 100000
+
+def create_change_log(conn):
+    execute_script(conn, f'''
+        CREATE TABLE IF NOT EXISTS student_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%S', 'now'))
+        );
+        CREATE TRIGGER IF NOT EXISTS student_changes_ai AFTER INSERT ON students BEGIN
+            INSERT INTO student_changes (student_id, op) VALUES (new.id, 'insert');
+        END;
+        CREATE TRIGGER IF NOT EXISTS student_changes_au
+        AFTER UPDATE OF name, grade, section, contact, date_registered ON students BEGIN
+            INSERT INTO student_changes (student_id, op) VALUES (new.id, 'update');
+        END;
+        CREATE TRIGGER IF NOT EXISTS student_changes_ad AFTER DELETE ON students BEGIN
+            INSERT INTO student_changes (student_id, op) VALUES (old.id, 'delete');
+        END;
+        CREATE TRIGGER IF NOT EXISTS student_changes_trim AFTER INSERT ON student_changes
+        WHEN new.seq % 1000 = 0 BEGIN
+            DELETE FROM student_changes WHERE seq <= new.seq - {CHANGE_LOG_RETENTION};
+        END;
+    ''')
+
+# Trigger-maintained rollups: total, per grade, per section and per
+# registration day. Reading a count becomes a primary-key lookup.
+STATS_DIMENSIONS = {
+    'grade': 'by_grade',
+    'section': 'by_section',
+    'day': 'by_day',
+}
+
+def create_stats_tables(conn):
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'student_stats'"
+    ).fetchone()
+    execute_script(conn, '''
+        CREATE TABLE IF NOT EXISTS student_stats (
+            dimension TEXT NOT NULL,
+            key TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (dimension, key)
+        ) WITHOUT ROWID;
+        CREATE TRIGGER IF NOT EXISTS student_stats_ai AFTER INSERT ON students BEGIN
+            INSERT INTO student_stats (dimension, key, count) VALUES
+                ('total', '', 1),
+                ('grade', new.grade, 1),
+                ('section', new.section, 1),
+                ('day', substr(new.date_registered, 1, 10), 1)
+            ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count;
+        END;
+        CREATE TRIGGER IF NOT EXISTS student_stats_ad AFTER DELETE ON students BEGIN
+            INSERT INTO student_stats (dimension, key, count) VALUES
+                ('total', '', -1),
+                ('grade', old.grade, -1),
+                ('section', old.section, -1),
+                ('day', substr(old.date_registered, 1, 10), -1)
+            ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count;
+        END;
+        CREATE TRIGGER IF NOT EXISTS student_stats_au
+        AFTER UPDATE OF grade, section, date_registered ON students BEGIN
+            INSERT INTO student_stats (dimension, key, count) VALUES
+                ('grade', old.grade, -1),
+                ('section', old.section, -1),
+                ('day', substr(old.date_registered, 1, 10), -1),
+                ('grade', new.grade, 1),
+                ('section', new.section, 1),
+                ('day', substr(new.date_registered, 1, 10), 1)
+            ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count;
+        END;
+    ''')
+    if not exists:
+        execute_script(conn, '''
+            INSERT INTO student_stats (dimension, key, count)
+                SELECT 'total', '', COUNT(*) FROM students;
+            INSERT INTO student_stats (dimension, key, count)
+                SELECT 'grade', grade, COUNT(*) FROM students GROUP BY grade;
+            INSERT INTO student_stats (dimension, key, count)
+                SELECT 'section', section, COUNT(*) FROM students GROUP BY section;
+            INSERT INTO student_stats (dimension, key, count)
+                SELECT 'day', substr(date_registered, 1, 10), COUNT(*) FROM students
+                GROUP BY substr(date_registered, 1, 10);
+        ''')
+
+# Full-text shadow index over the searchable columns. The trigram tokenizer
+# gives case-insensitive substring matching, same as the old LIKE '%term%',
+# and the triggers keep it in step with every write to students.
+SEARCH_COLUMNS = ('name', 'section', 'contact')
+
+def create_search_index(conn):
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'students_fts'"
+    ).fetchone()
+    execute_script(conn, '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5(
+            name, section, contact,
+            content='students', content_rowid='id', tokenize='trigram'
+        );
+        CREATE TRIGGER IF NOT EXISTS students_fts_ai AFTER INSERT ON students BEGIN
+            INSERT INTO students_fts(rowid, name, section, contact)
+            VALUES (new.id, new.name, new.section, new.contact);
+        END;
+        CREATE TRIGGER IF NOT EXISTS students_fts_ad AFTER DELETE ON students BEGIN
+            INSERT INTO students_fts(students_fts, rowid, name, section, contact)
+            VALUES ('delete', old.id, old.name, old.section, old.contact);
+        END;
+        CREATE TRIGGER IF NOT EXISTS students_fts_au AFTER UPDATE OF name, section, contact ON students BEGIN
+            INSERT INTO students_fts(students_fts, rowid, name, section, contact)
+            VALUES ('delete', old.id, old.name, old.section, old.contact);
+            INSERT INTO students_fts(rowid, name, section, contact)
+            VALUES (new.id, new.name, new.section, new.contact);
+        END;
+    ''')
+    if not exists:
+        conn.execute("INSERT INTO students_fts(students_fts) VALUES ('rebuild')")
+
+_has_search_index = None
+
+def has_search_index(conn):
+    global _has_search_index
+    if _has_search_index is None:
+        _has_search_index = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'students_fts'"
+        ).fetchone() is not None
+    return _has_search_index
+
+def fts_phrase(term):
+    return '"' + term.replace('"', '""') + '"'
+
+# Metrics. Request series are recorded by MetricsMiddleware, SQL series by
+# TimedCursor, which every pooled connection uses; all of it is served in
+# Prometheus text format on /metrics.
+metrics = Registry()
+http_requests = metrics.counter(
+    'http_requests_total', 'HTTP requests completed', ('route', 'method', 'status'))
+http_request_duration = metrics.histogram(
+    'http_request_duration_seconds', 'Time from request start until the last body byte',
+    ('route', 'method'))
+http_requests_in_flight = metrics.gauge(
+    'http_requests_in_flight', 'Requests currently being handled', ('route',))
+http_response_size = metrics.histogram(
+    'http_response_size_bytes', 'Response body size', ('route',), buckets=SIZE_BUCKETS)
+sql_statements = metrics.counter(
+    'sqlite_statements_total', 'SQL statements executed', ('statement', 'outcome'))
+sql_duration = metrics.histogram(
+    'sqlite_statement_duration_seconds', 'Time spent in execute()/commit()', ('statement',))
+sql_rows = metrics.counter(
+    'sqlite_rows_returned_total', 'Rows fetched from statement results', ('statement',))
+sql_lock_wait = metrics.histogram(
+    'sqlite_lock_wait_seconds',
+    'Time spent acquiring the write lock (BEGIN IMMEDIATE, or statements that gave up as locked)')
+sql_slow_statements = metrics.counter(
+    'sqlite_slow_statements_total', 'Statements at or over SLOW_QUERY_THRESHOLD', ('statement', 'full_scan'))
+http_slow_requests = metrics.counter(
+    'http_slow_requests_total', 'Requests at or over SLOW_REQUEST_THRESHOLD', ('route', 'method'))
+
+# Statement label: whitespace collapsed and placeholder lists folded, so
+# IN (?, ?, ...) of any length is one series
+@functools.lru_cache(maxsize=1024)
+def statement_label(sql):
+    label = re.sub(r'\?(\s*,\s*\?)+', '?, ...', ' '.join(sql.split()))
+    return label[:200]
+
+def record_statement(sql, elapsed, error=None):
+    label = statement_label(sql)
+    locked = isinstance(error, sqlite3.OperationalError) and 'locked' in str(error)
+    sql_statements.inc(label, 'ok' if error is None else 'locked' if locked else 'error')
+    sql_duration.observe(elapsed, label)
+    if locked or label.upper().startswith(('BEGIN IMMEDIATE', 'BEGIN EXCLUSIVE')):
+        sql_lock_wait.observe(elapsed)
+
+# Slow log. Statements at or over SLOW_QUERY_THRESHOLD (execute plus fetch
+# time) are kept with the shape of their parameters - types and lengths,
+# never values - and their EXPLAIN QUERY PLAN, with any full table scans
+# called out; requests at or over SLOW_REQUEST_THRESHOLD with how much of
+# their time went to SQL. Both live in memory, per process, on /debug/slow.
+slow_queries = deque(maxlen=app.config['SLOW_LOG_SIZE'])
+slow_requests = deque(maxlen=app.config['SLOW_LOG_SIZE'])
+PLANNED_STATEMENTS = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+_query_plans = {}
+
+# Called once per statement, when it is done; parameters is None for
+# executemany()
+def finish_statement(conn, sql, parameters, elapsed, rows):
+    if has_request_context():
+        environ = request.environ
+        environ['sql.statements'] = environ.get('sql.statements', 0) + 1
+        environ['sql.seconds'] = environ.get('sql.seconds', 0) + elapsed
+    if elapsed >= app.config['SLOW_QUERY_THRESHOLD']:
+        log_slow_query(conn, sql, parameters, elapsed, rows)
+
+def _value_shape(value):
+    if isinstance(value, (str, bytes)):
+        return f'{type(value).__name__}[{len(value)}]'
+    return type(value).__name__
+
+# ['int', 'str[12]', 'int x100'] for positional parameters, runs folded
+def parameter_shape(parameters):
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {name: _value_shape(value) for name, value in parameters.items()}
+    shapes = []
+    for shape, run in itertools.groupby(map(_value_shape, parameters)):
+        count = len(list(run))
+        shapes.append(shape if count == 1 else f'{shape} x{count}')
+    return shapes
+
+# EXPLAIN QUERY PLAN as indented lines, once per statement label. Run on a
+# plain cursor of the same connection, so it sees the same schema and
+# doesn't count towards the SQL metrics. executemany() statements are
+# planned with NULLs bound.
+def query_plan(conn, sql, parameters):
+    label = statement_label(sql)
+    plan = _query_plans.get(label)
+    if plan is not None:
+        return plan
+    if not label.upper().startswith(PLANNED_STATEMENTS):
+        return []
+    if parameters is None:
+        parameters = (None,) * sql.count('?')
+    try:
+        rows = sqlite3.Cursor(conn).execute('EXPLAIN QUERY PLAN ' + sql, parameters).fetchall()
+    except sqlite3.Error:
+        return []
+    depth = {0: -1}
+    plan = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        plan.append('  ' * depth[node] + detail)
+    if len(_query_plans) >= 256:
+        _query_plans.clear()
+    _query_plans[label] = plan
+    return plan
+
+# Tables read start to end: SCAN steps, other than FTS5 lookups (virtual
+# table scans), subquery results, the schema and SELECTs without a FROM.
+# A scan under a LIMIT may stop early; rows tells how far it got.
+def full_scans(plan):
+    tables = []
+    for line in plan:
+        match = re.match(r'\s*SCAN (?:TABLE )?(\w+)(.*)', line)
+        if (match and match.group(1) != 'CONSTANT' and not match.group(1).startswith('sqlite_')
+                and 'VIRTUAL TABLE' not in match.group(2)):
+            tables.append(match.group(1))
+    return tables
+
+def log_slow_query(conn, sql, parameters, elapsed, rows):
+    label = statement_label(sql)
+    plan = query_plan(conn, sql, parameters)
+    scans = full_scans(plan)
+    sql_slow_statements.inc(label, 'yes' if scans else 'no')
+    slow_queries.appendleft({
+        'at': _timestamp(time.time()),
+        'route': request.environ.get('metrics.route') if has_request_context() else None,
+        'sql': ' '.join(sql.split()),
+        'parameters': parameter_shape(parameters),
+        'executemany': parameters is None,
+        'duration_ms': round(elapsed * 1000, 3),
+        'rows': rows,
+        'plan': plan,
+        'full_scan': scans,
+        'temp_b_tree': any('USE TEMP B-TREE' in line for line in plan),
+    })
+    app.logger.warning('Slow query (%.1f ms, %d rows%s): %s', elapsed * 1000, rows,
+                       f', full scan of {", ".join(scans)}' if scans else '', label)
+
+# Called by MetricsMiddleware once the response is done. Long polls and
+# event streams wait on purpose and mark themselves with slow_log.skip.
+def log_slow_request(environ, route, method, status, elapsed):
+    if environ.get('slow_log.skip'):
+        return
+    http_slow_requests.inc(route, method)
+    slow_requests.appendleft({
+        'at': _timestamp(time.time()),
+        'route': route,
+        'method': method,
+        'path': environ.get('PATH_INFO', ''),
+        'query': query_shape(environ.get('QUERY_STRING', '')),
+        'status': int(status),
+        'duration_ms': round(elapsed * 1000, 3),
+        'sql_ms': round(environ.get('sql.seconds', 0) * 1000, 3),
+        'statements': environ.get('sql.statements', 0),
+        'profile': environ.get('profile.name'),
+    })
+    app.logger.warning('Slow request (%.1f ms, %.1f ms in SQL): %s %s', elapsed * 1000,
+                       environ.get('sql.seconds', 0) * 1000, method, environ.get('PATH_INFO', ''))
+
+# Query string with each value replaced by its length, as in
+# parameter_shape(): 'q=str[5]&limit=str[2]'
+def query_shape(query_string):
+    return '&'.join(f'{name}=str[{len(value)}]'
+                    for name, value in parse_qsl(query_string, keep_blank_values=True))
+
+class TimedCursor(sqlite3.Cursor):
+    statement = None
+    # [sql, parameters, seconds, rows] of the statement being read; it is
+    # checked against SLOW_QUERY_THRESHOLD, fetch time included, once its
+    # rows run out (fetch or iteration), fetchone() has been called, or the
+    # cursor is reused
+    _pending = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        self.statement = sql
+        started = time.perf_counter()
+        try:
+            result = super().execute(sql, parameters)
+        except sqlite3.Error as exc:
+            record_statement(sql, time.perf_counter() - started, exc)
+            raise
+        elapsed = time.perf_counter() - started
+        record_statement(sql, elapsed)
+        self._pending = [sql, parameters, elapsed, 0]
+        if self.description is None:
+            self._finish()
+        return result
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        self.statement = sql
+        started = time.perf_counter()
+        try:
+            result = super().executemany(sql, seq_of_parameters)
+        except sqlite3.Error as exc:
+            record_statement(sql, time.perf_counter() - started, exc)
+            raise
+        elapsed = time.perf_counter() - started
+        record_statement(sql, elapsed)
+        finish_statement(self.connection, sql, None, elapsed, self.rowcount)
+        return result
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        if row is not None:
+            sql_rows.inc(statement_label(self.statement))
+        self._fetched(started, row is not None, True)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        if rows:
+            sql_rows.inc(statement_label(self.statement), amount=len(rows))
+        self._fetched(started, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        if rows:
+            sql_rows.inc(statement_label(self.statement), amount=len(rows))
+        self._fetched(started, len(rows), True)
+        return rows
+
+    # for row in cursor: finished when the rows run out
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(started, 0, True)
+            raise
+        sql_rows.inc(statement_label(self.statement))
+        self._fetched(started, 1, False)
+        return row
+
+    def _fetched(self, started, rows, done):
+        pending = self._pending
+        if pending is not None:
+            pending[2] += time.perf_counter() - started
+            pending[3] += rows
+            if done:
+                self._finish()
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            finish_statement(self.connection, *pending)
+
+# Connection pool of long-lived connections. Each app context checks one
+# out and hands it back at teardown; idle connections are reused LIFO, so a
+# sync worker thread keeps getting the same one and the pool only grows to
+# the number of requests actually in flight. Prepared statements are
+# reused through sqlite3's per-connection statement cache, which only pays
+# off because the connection outlives the request.
+class PooledConnection(sqlite3.Connection):
+    # Cached (marker, version, modified) for current_data_version()
+    data_version = None
+
+    # Route every statement through TimedCursor
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            super().commit()
+        except sqlite3.Error as exc:
+            record_statement('COMMIT', time.perf_counter() - started, exc)
+            raise
+        record_statement('COMMIT', time.perf_counter() - started)
+
+_idle = []
+_connections = []
+_connections_lock = threading.Lock()
+
+def _connect():
+    # check_same_thread is off because a streamed response may be iterated
+    # on a different thread than the one that checked the connection out,
+    # and so the shutdown hook can close every connection. Checkout still
+    # guarantees one user at a time.
+    conn = sqlite3.connect(
+        DATABASE,
+        check_same_thread=False,
+        cached_statements=app.config['SQLITE_CACHED_STATEMENTS'],
+        factory=PooledConnection,
+    )
     conn.row_factory = sqlite3.Row
+    for pragma, value in app.config['SQLITE_PRAGMAS'].items():
+        conn.execute(f'PRAGMA {pragma} = {value}')
     return conn
 
+# Helper function to get db connection
+def get_db():
+    if 'db' not in g:
+        with _connections_lock:
+            conn = _idle.pop() if _idle else None
+        if conn is None:
+            conn = _connect()
+            with _connections_lock:
+                _connections.append(conn)
+        g.db = conn
+    return g.db
+
+# Hand the connection back at the end of the app context. A handler that
+# raised mid-write must not leave a transaction (and the write lock) open.
+@app.teardown_appcontext
+def release_db(exc):
+    conn = g.pop('db', None)
+    if conn is None:
+        return
+    if conn.in_transaction:
+        conn.rollback()
+    with _connections_lock:
+        if conn in _connections:
+            _idle.append(conn)
+
+# Shutdown hook: close every pooled connection, e.g. on worker exit
+def close_all_connections():
+    with _connections_lock:
+        _idle.clear()
+        while _connections:
+            _connections.pop().close()
+
+# A forked child (gunicorn --preload) must not reuse the parent's handles
+def _reset_pool_after_fork():
+    global _connections_lock
+    _idle.clear()
+    _connections.clear()
+    _connections_lock = threading.Lock()
+
+atexit.register(close_all_connections)
+os.register_at_fork(after_in_child=_reset_pool_after_fork)
+
+# WSGI middleware timing each request until its body has been fully sent,
+# which for streamed responses is when the stream is closed
+class MetricsMiddleware:
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        started = time.perf_counter()
+        status = ['500']
+        length = [0]
+        
+        def metered_start_response(status_line, headers, exc_info=None):
+            status[0] = status_line[:3]
+            length[0] = next((int(value) for name, value in headers if name.lower() == 'content-length'), 0)
+            return start_response(status_line, headers, exc_info)
+        
+        try:
+            body = self.wsgi_app(environ, metered_start_response)
+        except Exception:
+            self.finish(environ, status[0], started, 0)
+            raise
+        # A file wrapper is passed through as is, so the server can still
+        # sendfile() it; its size is taken from Content-Length
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if isinstance(file_wrapper, type) and isinstance(body, file_wrapper):
+            close = body.close
+            
+            def metered_close():
+                try:
+                    close()
+                finally:
+                    self.finish(environ, status[0], started, length[0])
+            body.close = metered_close
+            return body
+        return MeteredBody(body, lambda size: self.finish(environ, status[0], started, size))
+
+    def finish(self, environ, status, started, size):
+        route = environ.get('metrics.route', '<unmatched>')
+        method = environ['REQUEST_METHOD']
+        if 'metrics.route' in environ:
+            http_requests_in_flight.dec(route)
+        elapsed = time.perf_counter() - started
+        http_requests.inc(route, method, status)
+        http_request_duration.observe(elapsed, route, method)
+        http_response_size.observe(size, route)
+        if elapsed >= app.config['SLOW_REQUEST_THRESHOLD']:
+            log_slow_request(environ, route, method, status, elapsed)
+
+class MeteredBody:
+    def __init__(self, body, on_close):
+        self.body = body
+        self.on_close = on_close
+        self.size = 0
+
+    def __iter__(self):
+        for chunk in self.body:
+            self.size += len(chunk)
+            yield chunk
+
+    def close(self):
+        try:
+            if hasattr(self.body, 'close'):
+                self.body.close()
+        finally:
+            self.on_close(self.size)
+
+app.wsgi_app = MetricsMiddleware(app.wsgi_app)
+
+# Sampling profiler. While a profiled request runs, one shared thread
+# looks at the stack of the thread serving it every PROFILE_INTERVAL
+# seconds; when the response is closed the counts are written to
+# PROFILE_DIR in collapsed-stack format ("outer;...;inner count" per line),
+# which flamegraph.pl, inferno and speedscope read as is. A request is
+# profiled when it carries X-Profile: <PROFILE_TOKEN>, or at random at
+# PROFILE_SAMPLE_RATE; the file name comes back in X-Profile-Id. Under
+# asgi.py only the thread that started the request is sampled.
+def collapse_stack(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+class SamplingProfiler:
+    def __init__(self, interval):
+        self.interval = interval
+        self._stacks = {}       # thread id -> Counter of collapsed stacks
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, thread_id):
+        with self._lock:
+            self._stacks[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+                self._thread.start()
+
+    def stop(self, thread_id):
+        with self._lock:
+            return self._stacks.pop(thread_id, Counter())
+
+    def reset_after_fork(self):
+        self._stacks = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    # Exits once nothing is being profiled; start() brings up a new one
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                if not self._stacks:
+                    self._thread = None
+                    return
+                for thread_id, counts in self._stacks.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        counts[collapse_stack(frame)] += 1
+
+profiler = SamplingProfiler(app.config['PROFILE_INTERVAL'])
+os.register_at_fork(after_in_child=profiler.reset_after_fork)
+
+def profile_dir():
+    return app.config['PROFILE_DIR'] or f'{DATABASE}-profiles'
+
+# Time first, so the newest files sort last
+def profile_name(environ):
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', environ.get('PATH_INFO', '')).strip('_')[:60] or 'index'
+    return f'{time.strftime("%Y%m%dT%H%M%S")}-{os.getpid()}-{secrets.token_hex(3)}-{slug}.folded'
+
+def save_profile(name, stacks):
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        for stack, count in stacks.most_common():
+            f.write(f'{stack} {count}\n')
+    os.replace(path + '.tmp', path)
+    names = sorted(n for n in os.listdir(directory) if n.endswith('.folded'))
+    for old in names[:-app.config['PROFILE_MAX_FILES']]:
+        try:
+            os.remove(os.path.join(directory, old))
+        except FileNotFoundError:
+            pass
+
+# X-Profile: <PROFILE_TOKEN>; never true while no token is configured
+def has_profile_token(environ):
+    token = app.config['PROFILE_TOKEN']
+    header = environ.get('HTTP_X_PROFILE')
+    return bool(token and header and
+                secrets.compare_digest(header.encode('latin-1'), token.encode('utf-8')))
+
+class ProfilingMiddleware:
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        if not self.wanted(environ):
+            return self.wsgi_app(environ, start_response)
+        name = environ['profile.name'] = profile_name(environ)
+        thread_id = threading.get_ident()
+        
+        def profiled_start_response(status_line, headers, exc_info=None):
+            return start_response(status_line, headers + [('X-Profile-Id', name)], exc_info)
+        
+        profiler.start(thread_id)
+        try:
+            body = self.wsgi_app(environ, profiled_start_response)
+        except Exception:
+            self.finish(thread_id, name)
+            raise
+        return MeteredBody(body, lambda size: self.finish(thread_id, name))
+
+    # The /debug endpoints aren't profiled; they carry the token too
+    def wanted(self, environ):
+        if environ.get('PATH_INFO', '').startswith('/debug/'):
+            return False
+        if has_profile_token(environ):
+            return True
+        rate = app.config['PROFILE_SAMPLE_RATE']
+        return rate > 0 and random.random() < rate
+
+    def finish(self, thread_id, name):
+        stacks = profiler.stop(thread_id)
+        try:
+            save_profile(name, stacks)
+        except OSError:
+            app.logger.exception('Could not save profile %s', name)
+
+app.wsgi_app = ProfilingMiddleware(app.wsgi_app)
+
+@app.before_request
+def track_in_flight():
+    route = request.url_rule.rule if request.url_rule else '<unmatched>'
+    request.environ['metrics.route'] = route
+    http_requests_in_flight.inc(route)
+
+# Admission control. Reads and writes each get their own gate, so a burst
+# of writes queues behind WRITE_CONCURRENCY instead of tying up every
+# thread while reads carry on under READ_CONCURRENCY. A request holds its
+# slot until teardown, which for a streamed response is when the stream
+# ends. Past the queue limits the request fails fast with 503 and
+# Retry-After, as does a write that can't get SQLite's lock in time.
+class Overloaded(Exception):
+    def __init__(self, gate, reason):
+        super().__init__(f'{gate}: {reason}')
+        self.gate = gate
+        self.reason = reason
+
+class AdmissionGate:
+    def __init__(self, name, limit, max_queue, max_wait):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            if self.limit <= 0 or (self.in_flight < self.limit and not self.waiting):
+                self._admit()
+                return
+            if self.waiting >= self.max_queue:
+                raise Overloaded(self.name, 'queue_full')
+            started = time.monotonic()
+            deadline = started + self.max_wait
+            self.waiting += 1
+            try:
+                while self.in_flight >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise Overloaded(self.name, 'timeout')
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+                admission_queued.set(self.name, value=self.waiting)
+            admission_wait.observe(time.monotonic() - started, self.name)
+            self._admit()
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            admission_in_flight.set(self.name, value=self.in_flight)
+            self._cond.notify()
+
+    def reset_after_fork(self):
+        self.in_flight = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def _admit(self):
+        self.in_flight += 1
+        admission_in_flight.set(self.name, value=self.in_flight)
+        if self.waiting:
+            admission_queued.set(self.name, value=self.waiting)
+
+admission_in_flight = metrics.gauge(
+    'admission_in_flight', 'Requests holding an admission slot', ('gate',))
+admission_queued = metrics.gauge(
+    'admission_queued', 'Requests waiting for an admission slot', ('gate',))
+admission_wait = metrics.histogram(
+    'admission_wait_seconds', 'Time queued before admission, for requests that had to wait', ('gate',))
+admission_rejected = metrics.counter(
+    'admission_rejected_total', 'Requests turned away with 503', ('gate', 'reason'))
+
+read_gate = AdmissionGate('read', app.config['READ_CONCURRENCY'],
+                          app.config['READ_QUEUE_DEPTH'], app.config['READ_QUEUE_TIMEOUT'])
+write_gate = AdmissionGate('write', app.config['WRITE_CONCURRENCY'],
+                           app.config['WRITE_QUEUE_DEPTH'], app.config['WRITE_QUEUE_TIMEOUT'])
+os.register_at_fork(after_in_child=read_gate.reset_after_fork)
+os.register_at_fork(after_in_child=write_gate.reset_after_fork)
+
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+# Endpoints that never queue: they don't touch the students table
+ADMISSION_EXEMPT = ('metrics_endpoint', 'slow_log', 'list_profiles', 'get_profile', 'static_file', 'index')
+
+@app.before_request
+def admit_request():
+    if request.endpoint is None or request.endpoint in ADMISSION_EXEMPT:
+        return
+    gate = write_gate if request.method in WRITE_METHODS else read_gate
+    gate.acquire()
+    g.admission = gate
+
+# Give the slot back early, for a request about to spend its time waiting
+# (long polls, event streams) rather than working
+def release_admission():
+    gate = g.pop('admission', None)
+    if gate is not None:
+        gate.release()
+
+@app.teardown_request
+def release_admission_slot(exc):
+    release_admission()
+
+@app.errorhandler(Overloaded)
+def overloaded(exc):
+    admission_rejected.inc(exc.gate, exc.reason)
+    response = jsonify({'error': 'Server busy, retry shortly'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(app.config['RETRY_AFTER'])
+    return response
+
+# Take the write lock (BEGIN IMMEDIATE). SQLite's own busy handler polls
+# on a fixed schedule, so writers that lost the race in every worker retry
+# in step; here each attempt waits only WRITE_BUSY_TIMEOUT inside SQLite,
+# then sleeps a random time up to a doubling cap (full jitter). Gives up
+# with Overloaded after timeout seconds (default WRITE_LOCK_TIMEOUT).
+def begin_write(conn, timeout=None):
+    deadline = time.monotonic() + (app.config['WRITE_LOCK_TIMEOUT'] if timeout is None else timeout)
+    backoff = app.config['WRITE_BUSY_TIMEOUT']
+    conn.execute(f'PRAGMA busy_timeout = {int(app.config["WRITE_BUSY_TIMEOUT"] * 1000)}')
+    try:
+        while True:
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                return
+            except sqlite3.OperationalError as exc:
+                if 'locked' not in str(exc):
+                    raise
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise Overloaded('sqlite', 'locked') from exc
+            time.sleep(min(random.uniform(0, backoff), remaining))
+            backoff = min(backoff * 2, app.config['WRITE_BACKOFF_MAX'])
+    finally:
+        conn.execute(f'PRAGMA busy_timeout = {app.config["SQLITE_PRAGMAS"].get("busy_timeout", 5000)}')
+
+# Group commit (optional, GROUP_COMMIT=1): single-row writes are queued to
+# one writer thread with its own connection. It drains whatever arrives
+# within GROUP_COMMIT_MAX_DELAY seconds (up to GROUP_COMMIT_MAX_BATCH
+# writes) into one transaction, so concurrent requests share a single
+# lock acquisition and fsync. Each write runs in its own savepoint and
+# its caller gets back its own result or exception, after the commit.
+class GroupCommitWriter:
+    def __init__(self, max_delay, max_batch):
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # Queued under the lock, so a write can't land on the queue of a
+    # writer that has just died (see _run)
+    def submit(self, fn, *args):
+        future = Future()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, args=(self._queue,),
+                                                name='group-commit', daemon=True)
+                self._thread.start()
+            self._queue.put((fn, args, future))
+        return future.result()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(None)
+                self._queue = queue.Queue()
+        if thread is not None:
+            thread.join()
+
+    def reset_after_fork(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # If the writer itself fails (no connection, a rollback that raises),
+    # every write it holds or has queued fails with that error and the
+    # next submit() starts a new writer, rather than callers waiting forever
+    def _run(self, writes):
+        batch = []
+        try:
+            conn = _connect()
+            try:
+                stopping = False
+                while not stopping:
+                    item = writes.get()
+                    if item is None:
+                        break
+                    batch = [item]
+                    deadline = time.monotonic() + self.max_delay
+                    while len(batch) < self.max_batch:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        try:
+                            item = writes.get(timeout=remaining)
+                        except queue.Empty:
+                            break
+                        if item is None:
+                            stopping = True
+                            break
+                        batch.append(item)
+                    self._commit(conn, batch)
+            finally:
+                conn.close()
+        except Exception as exc:
+            app.logger.exception('Group commit writer failed')
+            with self._lock:
+                if self._queue is writes:
+                    self._queue = queue.Queue()
+                    self._thread = None
+            while True:
+                try:
+                    item = writes.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    batch.append(item)
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+
+    def _commit(self, conn, batch):
+        outcomes = []
+        try:
+            begin_write(conn)
+            for fn, args, future in batch:
+                conn.execute('SAVEPOINT write')
+                try:
+                    outcomes.append((future, fn(conn, *args), None))
+                except Exception as exc:
+                    conn.execute('ROLLBACK TO write')
+                    outcomes.append((future, None, exc))
+                conn.execute('RELEASE write')
+            conn.commit()
+        except Exception as exc:
+            if conn.in_transaction:
+                conn.rollback()
+            for _, _, future in batch:
+                future.set_exception(exc)
+            return
+        for future, result, exc in outcomes:
+            if exc is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exc)
+
+group_writer = GroupCommitWriter(
+    app.config['GROUP_COMMIT_MAX_DELAY'],
+    app.config['GROUP_COMMIT_MAX_BATCH'],
+)
+atexit.register(group_writer.stop)
+os.register_at_fork(after_in_child=group_writer.reset_after_fork)
+
+# Run fn(conn, *args) as a committed write, through the group-commit writer
+# when it is enabled or on this thread's pooled connection otherwise
+def execute_write(fn, *args):
+    if app.config['GROUP_COMMIT']:
+        return group_writer.submit(fn, *args)
+    conn = get_db()
+    try:
+        begin_write(conn)
+        result = fn(conn, *args)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return result
+
+# Current (version, modified) of the data. PRAGMA data_version moves when
+# another connection commits and total_changes when this one writes; while
+# neither has moved the cached value is still good, so an unchanged poll
+# never reads a table.
+def current_data_version():
+    conn = get_db()
+    marker = (conn.execute('PRAGMA data_version').fetchone()[0], conn.total_changes)
+    cached = conn.data_version
+    if cached is None or cached[0] != marker:
+        row = conn.execute('SELECT version, modified FROM data_version WHERE id = 1').fetchone()
+        cached = conn.data_version = (marker, row['version'], row['modified'])
+    return cached[1], cached[2]
+
+# Conditional GET for read routes: the ETag is the global data version, so
+# a repeat poll with a matching If-None-Match (or a fresh If-Modified-Since)
+# is answered with 304 before the view runs.
+def versioned(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        version, modified = current_data_version()
+        etag = f'v{version}'
+        last_modified = datetime.fromtimestamp(modified, timezone.utc)
+        if request.if_none_match:
+            matched = matching_etag(request.if_none_match, etag)
+        else:
+            matched = (etag if request.if_modified_since is not None
+                       and last_modified <= request.if_modified_since else None)
+        
+        if matched:
+            response = Response(status=304)
+            response.set_etag(matched)
+        else:
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            # @cached bodies come back already compressed
+            response.set_etag(f'{etag}-{response.content_encoding}' if response.content_encoding else etag)
+        response.last_modified = last_modified
+        response.cache_control.no_cache = True
+        return response
+    return wrapper
+
+# Turn a matching If-None-Match into a 304 for views that set their own ETag
+def conditional(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        response = app.make_response(view(*args, **kwargs))
+        etag = response.get_etag()[0]
+        if response.status_code == 200 and etag and request.if_none_match:
+            matched = matching_etag(request.if_none_match, base_etag(etag))
+            if matched:
+                not_modified = Response(status=304)
+                not_modified.set_etag(matched)
+                not_modified.cache_control.no_cache = True
+                return not_modified
+        return response
+    return wrapper
+
+# In-process read-through cache of serialized JSON responses, bounded by
+# entry count and total bytes with LRU eviction and a TTL. Entries carry
+# tags so a write can drop exactly what it affects: 'student:<id>' for a
+# single student, 'students' for every collection view. The cache is per
+# process; keys include the data version so a write from another worker
+# can never be served stale.
+class ReadCache:
+    def __init__(self, max_entries, max_bytes, ttl):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (body, headers, tags, expires)
+        self._tags = {}                 # tag -> set of keys
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[3] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def set(self, key, body, headers, tags):
+        if self.max_entries <= 0 or len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (body, headers, tags, time.monotonic() + self.ttl)
+            self.bytes += len(body)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, *tags):
+        with self._lock:
+            for tag in tags:
+                for key in self._tags.pop(tag, ()):
+                    if key in self._entries:
+                        self._remove(key)
+                        self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+    def _remove(self, key):
+        body, _, tags, _ = self._entries.pop(key)
+        self.bytes -= len(body)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+read_cache = ReadCache(
+    app.config['READ_CACHE_MAX_ENTRIES'],
+    app.config['READ_CACHE_MAX_BYTES'],
+    app.config['READ_CACHE_TTL'],
+)
+
+# Serve a view from read_cache. Tags are formatted with the view's URL
+# arguments, e.g. @cached('student:{id}'). The key includes the data
+# version, and the negotiated encoding since bodies are stored already
+# compressed. Streamed and non-200 responses are never cached.
+CACHED_HEADERS = ('ETag', 'Content-Encoding', 'Vary')
+
+def cached(*tags):
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = (request.path, request.query_string, preferred_encoding(), current_data_version()[0])
+            hit = read_cache.get(key)
+            if hit is not None:
+                response = Response(hit[0], mimetype='application/json', headers=hit[1])
+                if 'ETag' in hit[1]:
+                    response.cache_control.no_cache = True
+                return response
+            
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                compress_response(response)
+                headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+                read_cache.set(key, response.get_data(), headers,
+                               [tag.format(**kwargs) for tag in tags])
+            return response
+        return wrapper
+    return decorator
+
+# Query API for /students: filters, multi-key sort and field projection,
+# compiled to parameterized SQL shaped to use the indexes from
+# _create_query_indexes(). Every name used in SQL comes from the tables
+# below, never from the request.
+#
+#   ?grade=10  ?section=A,B            equality / IN
+#   ?grade_min=9&grade_max=11          inclusive ranges (any filter field)
+#   ?date_registered_min=2025-10-01    a date-only _max covers that whole day
+#   ?sort=grade,-name                  '-' for descending; id breaks ties
+#   ?fields=id,name                    projection
+STUDENT_COLUMNS = ('id', 'name', 'grade', 'section', 'contact', 'date_registered', 'version')
+FILTER_FIELDS = {'id': int, 'grade': int, 'section': str, 'date_registered': str}
+SORT_FIELDS = {
+    'id': 'id',
+    'name': 'name COLLATE NOCASE',
+    'grade': 'grade',
+    'section': 'section',
+    'date_registered': 'date_registered',
+}
+DEFAULT_ORDER = [('id', 'id', True)]
+
+class QueryError(ValueError):
+    pass
+
+def _filter_values(field, raw):
+    try:
+        values = [FILTER_FIELDS[field](value) for value in raw.split(',')]
+    except ValueError:
+        raise QueryError(f'{field} must be an integer')
+    if FILTER_FIELDS[field] is int and not all(map(fits_int64, values)):
+        raise QueryError(f'{field} is out of range')
+    return values
+
+def compile_student_query(args):
+    where = []
+    params = []
+    for field in FILTER_FIELDS:
+        if field in args:
+            values = _filter_values(field, args[field])
+            where.append(f'{field} = ?' if len(values) == 1 else
+                         f'{field} IN ({", ".join("?" * len(values))})')
+            params += values
+        if f'{field}_min' in args:
+            where.append(f'{field} >= ?')
+            params += _filter_values(field, args[f'{field}_min'])[:1]
+        if f'{field}_max' in args:
+            value = _filter_values(field, args[f'{field}_max'])[0]
+            if field == 'date_registered' and len(value) == 10:
+                where.append(f'{field} < date(?, \'+1 day\')')
+            else:
+                where.append(f'{field} <= ?')
+            params.append(value)
+    
+    order = []
+    for key in filter(None, args.get('sort', '').split(',')):
+        field = key.lstrip('-')
+        if field not in SORT_FIELDS:
+            raise QueryError(f'Cannot sort by {field}; expected one of: {", ".join(SORT_FIELDS)}')
+        order.append((field, SORT_FIELDS[field], key.startswith('-')))
+    if not order:
+        order = list(DEFAULT_ORDER)
+    elif 'id' not in (field for field, _, _ in order):
+        order.append(('id', 'id', False))
+    
+    fields = list(dict.fromkeys(f for f in args.get('fields', '').split(',') if f)) or list(STUDENT_COLUMNS)
+    unknown = [f for f in fields if f not in STUDENT_COLUMNS]
+    if unknown:
+        raise QueryError(f'Unknown fields: {", ".join(unknown)}')
+    
+    return where, params, order, fields
+
+# Keyset predicate "after this key" for a multi-column, mixed-direction
+# order: (a > ?) OR (a = ? AND b < ?) OR ...
+def keyset_predicate(order, key):
+    clauses = []
+    params = []
+    for i, (_, expr, desc) in enumerate(order):
+        terms = [f'{order[j][1]} = ?' for j in range(i)]
+        terms.append(f'{expr} {"<" if desc else ">"} ?')
+        clauses.append('(' + ' AND '.join(terms) + ')')
+        params += key[:i + 1]
+    return '(' + ' OR '.join(clauses) + ')', params
+
+# Row encoding for list responses: every row is written as a JSON object
+# straight from the SQLite row tuple, never built as a dict. Where SQLite
+# has the JSON functions (built in since 3.38) the database encodes it, via
+# json_object() in the select list; otherwise the text is joined from key
+# prefixes encoded once per field list. Select encoder.columns (extra
+# columns may follow) and pass each row to encoder.encode.
+def _sqlite_has_json():
+    conn = sqlite3.connect(':memory:')
+    try:
+        conn.execute("SELECT json_object('a', 1)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+SQLITE_JSON = app.config['JSON_ENCODER'] != 'stdlib' and _sqlite_has_json()
+_encode_string = json.encoder.encode_basestring_ascii
+
+def _encode_value(value):
+    if value is None:
+        return 'null'
+    if isinstance(value, str):
+        return _encode_string(value)
+    return repr(value)
+
+class RowEncoder:
+    def __init__(self, fields, table=None):
+        names = [f'{table}.{field}' if table else field for field in fields]
+        if SQLITE_JSON:
+            pairs = ', '.join(f"'{field}', {name}" for field, name in zip(fields, names))
+            self.columns = f'json_object({pairs})'
+            self.encode = operator.itemgetter(0)
+        else:
+            self.columns = ', '.join(names)
+            self.prefixes = [('{' if i == 0 else ',') + _encode_string(field) + ':'
+                             for i, field in enumerate(fields)]
+            self.encode = self._encode_tuple
+    
+    def _encode_tuple(self, row):
+        return ''.join([prefix + _encode_value(value) for prefix, value in zip(self.prefixes, row)]) + '}'
+
+@functools.lru_cache(maxsize=64)
+def row_encoder(fields, table=None):
+    return RowEncoder(fields, table)
+
+# Opaque pagination cursors: url-safe base64 of the last row's sort key
+def encode_cursor(key):
+    raw = json_dumps(key).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+# None unless the token holds a list of sort key values SQLite can bind
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        key = json_loads(raw)
+    except ValueError:
+        return None
+    if not isinstance(key, list) or not all(_cursor_value(value) for value in key):
+        return None
+    return key
+
+def _cursor_value(value):
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, int):
+        return fits_int64(value)
+    return isinstance(value, (str, float))
+
+# Whether an int can be bound as an SQLite INTEGER (larger ones raise
+# OverflowError at execute time)
+def fits_int64(value):
+    return -2 ** 63 <= value < 2 ** 63
+
+# Stream a cursor out as a JSON array, one fetchmany() batch at a time, so
+# memory stays bounded by the batch size rather than the table size. The
+# cursor selects encoder.columns.
+def stream_json_array(cursor, encoder):
+    yield '['
+    first = True
+    while True:
+        rows = cursor.fetchmany(app.config['STREAM_BATCH_SIZE'])
+        if not rows:
+            break
+        chunk = ','.join(map(encoder.encode, rows))
+        yield chunk if first else ',' + chunk
+        first = False
+    yield ']'
+
+# Export formats: mimetype, file extension and the cursor streamer for each
+def stream_ndjson(cursor, encoder):
+    while True:
+        rows = cursor.fetchmany(app.config['STREAM_BATCH_SIZE'])
+        if not rows:
+            break
+        yield '\n'.join(map(encoder.encode, rows)) + '\n'
+
+# CSV selects the plain columns; encoder is unused
+def stream_csv(cursor, encoder):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([col[0] for col in cursor.description])
+    while True:
+        rows = cursor.fetchmany(app.config['STREAM_BATCH_SIZE'])
+        if not rows:
+            break
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+# Cursor over the whole roster for an export format, and its row encoder
+def export_query(conn, fmt):
+    encoder = row_encoder(STUDENT_COLUMNS)
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(f'SELECT {", ".join(STUDENT_COLUMNS) if fmt == "csv" else encoder.columns} FROM students')
+    return cursor, encoder
+
+EXPORT_FORMATS = {
+    'json': ('application/json', 'json', stream_json_array),
+    'ndjson': ('application/x-ndjson', 'ndjson', stream_ndjson),
+    'csv': ('text/csv', 'csv', stream_csv),
+}
+
+# Content-Encoding support: gzip always, brotli when the package is
+# installed. best=True trades CPU for size, for content compressed once.
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+COMPRESS_MIMETYPES = ('application/json', 'application/x-ndjson')
+
+def _compressor(encoding, best=False):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=11 if best else app.config['BROTLI_QUALITY'])
+        return compressor.process, compressor.finish
+    # wbits=31 writes a gzip header
+    compressor = zlib.compressobj(9 if best else app.config['GZIP_LEVEL'], zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+def compress(data, encoding, best=False):
+    process, finish = _compressor(encoding, best)
+    return process(data) + finish()
+
+# Compress a stream of text or bytes chunks on the fly
+def compress_stream(chunks, encoding):
+    process, finish = _compressor(encoding)
+    for chunk in chunks:
+        if isinstance(chunk, ChangeWait):
+            yield chunk
+            continue
+        data = process(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield finish()
+
+# The client's most preferred encoding among those available, or None
+def preferred_encoding(available=ENCODINGS):
+    for encoding in available:
+        if encoding and request.accept_encodings[encoding]:
+            return encoding
+    return None
+
+# A strong ETag names one representation, so a compressed body's tag
+# carries the coding ('"v61-gzip"'), as StaticAsset's do. Conditional
+# requests compare the tag without it (any coding of an unchanged resource
+# is still fresh) and answer with the tag the client sent.
+ETAG_CODINGS = ('br', 'gzip')
+
+def base_etag(tag):
+    base, _, coding = tag.rpartition('-')
+    return base if base and coding in ETAG_CODINGS else tag
+
+def matching_etag(etags, etag):
+    if etags.star_tag:
+        return etag
+    return next((tag for tag in etags.as_set(include_weak=True) if base_etag(tag) == etag), None)
+
+# Compress JSON responses the client can take compressed: buffered ones
+# above COMPRESS_MIN_SIZE in one go, streamed ones chunk by chunk.
+# Responses that already carry a Content-Encoding, and files (which may be
+# served as ranges or with sendfile), are left alone.
+@app.after_request
+def compress_response(response):
+    if (response.status_code != 200 or response.direct_passthrough
+            or response.mimetype not in COMPRESS_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    if 'Content-Encoding' in response.headers:
+        return response
+    encoding = preferred_encoding()
+    if encoding is None:
+        return response
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+    elif response.content_length >= app.config['COMPRESS_MIN_SIZE']:
+        response.set_data(compress(response.get_data(), encoding))
+    else:
+        return response
+    response.content_encoding = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f'{etag}-{encoding}')
+    return response
+
+# Fields a partial update may set, validated; returns ({column: value}, error)
+def validate_student_changes(data):
+    if not isinstance(data, dict) or not any(k in data for k in IMPORT_FIELDS):
+        return None, f'data must set at least one of: {", ".join(IMPORT_FIELDS)}'
+    changes = {k: data[k] for k in IMPORT_FIELDS if k in data}
+    nulls = [k for k, value in changes.items() if value is None]
+    if nulls:
+        return None, f'Fields cannot be null: {", ".join(nulls)}'
+    return check_student_fields(changes)
+
+# Type-check the student fields present (and not null) in data; returns
+# ({field: value}, error). grade must be a whole number (or its text, as
+# CSV gives it) that fits SQLite's INTEGER; the text fields take strings,
+# or numbers, stored as their text like the column's affinity would.
+# Booleans, lists, objects and text that isn't UTF-8 are refused.
+STUDENT_FIELD_TYPES = {'name': str, 'grade': int, 'section': str, 'contact': str, 'date_registered': str}
+_SURROGATES = re.compile('[\ud800-\udfff]')
+
+def check_student_fields(data):
+    values = {}
+    for field, kind in STUDENT_FIELD_TYPES.items():
+        value = data.get(field)
+        if value is None:
+            continue
+        if kind is int:
+            if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+                return None, f'{field} must be an integer'
+            try:
+                value = int(value)
+            except (TypeError, ValueError, OverflowError):
+                return None, f'{field} must be an integer'
+            if not fits_int64(value):
+                return None, f'{field} is out of range'
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        elif not isinstance(value, str):
+            return None, f'{field} must be a string'
+        elif not value.isascii() and _SURROGATES.search(value):
+            return None, f'{field} is not valid UTF-8'
+        values[field] = value
+    return values, None
+
+# Single-row writes, run through execute_write()
+INSERT_STUDENT_SQL = '''
+    INSERT INTO students (name, grade, section, contact, date_registered)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+def _insert_student(conn, row):
+    return conn.execute(INSERT_STUDENT_SQL, row).lastrowid
+
+def _update_student(conn, id, data):
+    student = conn.execute('SELECT * FROM students WHERE id = ?', (id,)).fetchone()
+    if not student:
+        return False
+    
+    name = data.get('name', student['name'])
+    grade = data.get('grade', student['grade'])
+    section = data.get('section', student['section'])
+    contact = data.get('contact', student['contact'])
+    
+    conn.execute('''
+        UPDATE students 
+        SET name = ?, grade = ?, section = ?, contact = ?
+        WHERE id = ?
+    ''', (name, grade, section, contact, id))
+    return True
+
+# One UPDATE ... RETURNING touching only the given columns. The statement
+# bumps version itself (so row_version_au stays out of it and RETURNING
+# shows the new value) and, when versions are given, only matches a row
+# still at one of them.
+def _patch_student(conn, id, changes, versions):
+    sql = f'''
+        UPDATE students
+        SET {', '.join(f'{k} = ?' for k in changes)}, version = version + 1
+        WHERE id = ?'''
+    params = [*changes.values(), id]
+    if versions:
+        sql += f' AND version IN ({", ".join("?" * len(versions))})'
+        params += versions
+    rows = conn.execute(sql + ' RETURNING *', params).fetchall()
+    return dict(rows[0]) if rows else None
+
+def _delete_student(conn, id):
+    return conn.execute('DELETE FROM students WHERE id = ?', (id,)).rowcount
+
 # 1. Add Student (POST)
 @app.route('/student', methods=['POST'])
 def add_student():
@@ -40,15 +1784,9 @@ def add_student():
     
     date_registered = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO students (name, grade, section, contact, date_registered)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (data['name'], data['grade'], data['section'], data['contact'], date_registered))
-    conn.commit()
-    student_id = cursor.lastrowid
-    conn.close()
+    student_id = execute_write(_insert_student, (
+        data['name'], data['grade'], data['section'], data['contact'], date_registered))
+    read_cache.invalidate('students')
     
     return jsonify({
         'message': 'Student added successfully',
@@ -56,154 +1794,1213 @@ def add_student():
     }), 201
 
 # 2. View All Students (GET)
+# Accepts the query parameters described above compile_student_query().
+# Without ?limit/?after the matching rows are streamed as a plain JSON
+# array. With them, a page is returned along with an opaque cursor for the
+# next one (keyset on the sort key, so deep pages cost the same as the
+# first).
 @app.route('/students', methods=['GET'])
+@versioned
+@cached('students')
 def get_all_students():
+    limit = request.args.get('limit', type=int)
+    if limit is None and 'limit' in request.args:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    after = request.args.get('after')
+    try:
+        where, params, order, fields = compile_student_query(request.args)
+    except QueryError as exc:
+        return jsonify({'error': str(exc)}), 400
+    order_by = ', '.join(f'{expr} {"DESC" if desc else "ASC"}' for _, expr, desc in order)
+    
+    encoder = row_encoder(tuple(fields))
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM students ORDER BY id DESC')
-    students = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    cursor.row_factory = None
     
-    return jsonify(students)
+    if limit is None and after is None:
+        cursor.execute(f'''
+            SELECT {encoder.columns} FROM students
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            ORDER BY {order_by}
+        ''', params)
+        return Response(stream_with_context(stream_json_array(cursor, encoder)),
+                        mimetype='application/json')
+    
+    limit = min(max(limit or app.config['PAGE_DEFAULT_LIMIT'], 1), app.config['PAGE_MAX_LIMIT'])
+    
+    if after:
+        key = decode_cursor(after)
+        if not (isinstance(key, list) and len(key) == len(order)):
+            return jsonify({'error': 'Invalid cursor'}), 400
+        predicate, key_params = keyset_predicate(order, key)
+        where = where + [predicate]
+        params = params + key_params
+    
+    keys = [field for field, _, _ in order]
+    cursor.execute(f'''
+        SELECT {encoder.columns}, {', '.join(keys)} FROM students
+        {'WHERE ' + ' AND '.join(where) if where else ''}
+        ORDER BY {order_by}
+        LIMIT ?
+    ''', params + [limit + 1])
+    rows = cursor.fetchall()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(list(rows[-1][-len(keys):]))
+    
+    students = ','.join(map(encoder.encode, rows))
+    return Response(f'{{"students":[{students}],"next_cursor":{json_dumps(next_cursor)}}}\n',
+                    mimetype='application/json')
 
 # 3. View Single Student (GET)
+# The ETag is the row's own version, so edits to other students don't
+# invalidate it (the cached body is still keyed by the data version, so
+# another worker's edit is seen at once).
 @app.route('/student/<int:id>', methods=['GET'])
+@conditional
+@cached('student:{id}')
 def get_student(id):
     conn = get_db()
     cursor = conn.cursor()
     cursor.execute('SELECT * FROM students WHERE id = ?', (id,))
     student = cursor.fetchone()
-    conn.close()
     
-    if student:
-        return jsonify(dict(student))
-    return jsonify({'error': 'Student not found'}), 404
+    if not student:
+        return jsonify({'error': 'Student not found'}), 404
+    
+    response = jsonify(dict(student))
+    response.set_etag(f'r{student["version"]}')
+    response.cache_control.no_cache = True
+    return response
 
 # 4. Update Student (PUT)
 @app.route('/student/<int:id>', methods=['PUT'])
 def update_student(id):
     data = request.get_json()
     
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM students WHERE id = ?', (id,))
-    student = cursor.fetchone()
-    
-    if not student:
-        conn.close()
+    if not execute_write(_update_student, id, data):
         return jsonify({'error': 'Student not found'}), 404
-    
-    name = data.get('name', student['name'])
-    grade = data.get('grade', student['grade'])
-    section = data.get('section', student['section'])
-    contact = data.get('contact', student['contact'])
-    
-    cursor.execute('''
-        UPDATE students 
-        SET name = ?, grade = ?, section = ?, contact = ?
-        WHERE id = ?
-    ''', (name, grade, section, contact, id))
-    conn.commit()
-    conn.close()
+    read_cache.invalidate(f'student:{id}', 'students')
     
     return jsonify({'message': 'Student updated successfully'})
 
 # 5. Delete Student (DELETE)
 @app.route('/student/<int:id>', methods=['DELETE'])
 def delete_student(id):
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM students WHERE id = ?', (id,))
-    conn.commit()
-    rows_affected = cursor.rowcount
-    conn.close()
+    rows_affected = execute_write(_delete_student, id)
+    read_cache.invalidate(f'student:{id}', 'students')
     
     if rows_affected > 0:
         return jsonify({'message': 'Student deleted successfully'})
     return jsonify({'error': 'Student not found'}), 404
 
+# Patch Student (PATCH)
+# Only the fields in the body are written, in a single statement. Send
+# If-Match with the ETag from GET /student/<id> to make the update
+# conditional: if someone else changed the student first the answer is
+# 412 and nothing is written.
+@app.route('/student/<int:id>', methods=['PATCH'])
+def patch_student(id):
+    changes, error = validate_student_changes(request.get_json())
+    if error is not None:
+        return jsonify({'error': error}), 400
+    
+    versions = None
+    if request.if_match and not request.if_match.star_tag:
+        tags = map(base_etag, request.if_match.as_set())
+        versions = [int(tag[1:]) for tag in tags if tag.startswith('r') and tag[1:].isdigit()]
+        if not versions:
+            return jsonify({'error': 'Precondition failed'}), 412
+    
+    student = execute_write(_patch_student, id, changes, versions)
+    if student is None:
+        exists = get_db().execute('SELECT 1 FROM students WHERE id = ?', (id,)).fetchone()
+        if not exists:
+            return jsonify({'error': 'Student not found'}), 404
+        return jsonify({'error': 'Precondition failed'}), 412
+    read_cache.invalidate(f'student:{id}', 'students')
+    
+    response = jsonify(student)
+    response.set_etag(f'r{student["version"]}')
+    return response
+
 # 6. Search Student (GET)
+# ?name= matches the name column, ?q= matches name, section and contact.
+# Results are ranked by relevance (?sort=name for alphabetical) and capped
+# by ?limit.
 @app.route('/students/search', methods=['GET'])
+@versioned
+@cached('students')
 def search_students():
     name = request.args.get('name', '')
+    q = request.args.get('q', '')
+    term, columns = (q, SEARCH_COLUMNS) if q else (name, ('name',))
+    limit = request.args.get('limit', app.config['SEARCH_DEFAULT_LIMIT'], type=int)
+    limit = min(max(limit, 1), app.config['PAGE_MAX_LIMIT'])
+    order = 'students.name COLLATE NOCASE' if request.args.get('sort') == 'name' else 'students_fts.rank, students.name COLLATE NOCASE'
     
+    encoder = row_encoder(STUDENT_COLUMNS, 'students')
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM students 
-        WHERE LOWER(name) LIKE LOWER(?)
-        ORDER BY name
-    ''', (f'%{name}%',))
-    students = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    cursor.row_factory = None
+    if len(term) >= 3 and has_search_index(conn):
+        match = fts_phrase(term) if q else f'name : {fts_phrase(term)}'
+        cursor.execute(f'''
+            SELECT {encoder.columns} FROM students_fts
+            JOIN students ON students.id = students_fts.rowid
+            WHERE students_fts MATCH ?
+            ORDER BY {order}
+            LIMIT ?
+        ''', (match, limit))
+    else:
+        # Shorter than one trigram, so the index can't help
+        where = ' OR '.join(f'{col} LIKE ?' for col in columns)
+        cursor.execute(f'''
+            SELECT {encoder.columns} FROM students
+            WHERE {where}
+            ORDER BY name COLLATE NOCASE
+            LIMIT ?
+        ''', (*[f'%{term}%'] * len(columns), limit))
+    students = ','.join(map(encoder.encode, cursor.fetchall()))
     
-    return jsonify(students)
+    return Response(f'[{students}]\n', mimetype='application/json')
+
+def student_count(conn):
+    row = conn.execute("SELECT count FROM student_stats WHERE dimension = 'total' AND key = ''").fetchone()
+    return row['count'] if row else 0
 
 # 7. Count Students (GET)
 @app.route('/students/count', methods=['GET'])
+@versioned
+@cached('students')
 def count_students():
+    count = student_count(get_db())
+    
+    return jsonify({'count': count})
+
+# Student Stats (GET): total plus per-grade, per-section and per-day counts
+@app.route('/students/stats', methods=['GET'])
+@versioned
+@cached('students')
+def student_stats():
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('SELECT COUNT(*) as count FROM students')
-    count = cursor.fetchone()['count']
-    conn.close()
+    cursor.execute('SELECT dimension, key, count FROM student_stats WHERE count > 0')
     
-    return jsonify({'count': count})
+    stats = {'total': 0}
+    stats.update({name: {} for name in STATS_DIMENSIONS.values()})
+    for row in cursor.fetchall():
+        if row['dimension'] == 'total':
+            stats['total'] = row['count']
+        else:
+            stats[STATS_DIMENSIONS[row['dimension']]][row['key']] = row['count']
+    
+    return jsonify(stats)
+
+# Read cache counters, for tuning the READ_CACHE_* settings
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(read_cache.stats())
+
+# Change feed helpers. Each change carries the student's current row (None
+# once deleted), so applying it needs no further request.
+def read_changes(conn, since, limit):
+    rows = conn.execute(f'''
+        SELECT c.seq, c.op, c.student_id, {', '.join(f's.{col}' for col in STUDENT_COLUMNS)}
+        FROM student_changes c LEFT JOIN students s ON s.id = c.student_id
+        WHERE c.seq > ?
+        ORDER BY c.seq
+        LIMIT ?
+    ''', (since, limit)).fetchall()
+    return [{
+        'seq': row['seq'],
+        'op': row['op'],
+        'id': row['student_id'],
+        'student': {col: row[col] for col in STUDENT_COLUMNS} if row['id'] is not None else None,
+    } for row in rows]
+
+def last_change_seq(conn):
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'student_changes'").fetchone()
+    return row['seq'] if row else 0
+
+# True when changes after `since` have already been trimmed from the log
+def changes_trimmed(conn, since):
+    oldest = conn.execute('SELECT MIN(seq) FROM student_changes').fetchone()[0]
+    if oldest is None:
+        oldest = last_change_seq(conn) + 1
+    return oldest > since + 1
+
+# One poller per process for the change feed. Followers (long polls and
+# event streams) wait on it instead of each querying SQLite every
+# CHANGES_POLL_INTERVAL: while anyone is waiting a single thread reads
+# last_change_seq() at that interval and wakes them when it moves.
+# Threads wait on a Condition; asgi.py waits on its event loop (see
+# ChangeWait), so there an idle follower doesn't hold a pool thread.
+class ChangeNotifier:
+    def __init__(self, interval):
+        self.interval = interval
+        self.seq = None         # last seen; may be stale while nobody waits
+        self._waiting = 0
+        self._async_waiters = set()     # (loop, future, since)
+        self._cond = threading.Condition()
+        self._thread = None
+
+    # True once a change after since exists, False on timeout
+    def wait(self, since, timeout):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._waiting += 1
+            self._ensure_started()
+            try:
+                while self.seq is None or self.seq <= since:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                return True
+            finally:
+                self._waiting -= 1
+
+    async def wait_async(self, since, timeout):
+        loop = asyncio.get_running_loop()
+        waiter = (loop, loop.create_future(), since)
+        with self._cond:
+            if self.seq is not None and self.seq > since:
+                return True
+            self._async_waiters.add(waiter)
+            self._ensure_started()
+        try:
+            return await asyncio.wait_for(waiter[1], timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._cond:
+                self._async_waiters.discard(waiter)
+
+    def reset_after_fork(self):
+        self.seq = None
+        self._waiting = 0
+        self._async_waiters = set()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='change-poller', daemon=True)
+            self._thread.start()
+
+    # Exits once nobody is waiting; the next wait starts a new one
+    def _run(self):
+        conn = _connect()
+        try:
+            while True:
+                with self._cond:
+                    if not self._waiting and not self._async_waiters:
+                        self._thread = None
+                        return
+                try:
+                    seq = last_change_seq(conn)
+                except sqlite3.Error:
+                    app.logger.exception('Change poller failed to read the log')
+                    seq = self.seq
+                with self._cond:
+                    if seq is not None and seq != self.seq:
+                        self.seq = seq
+                        self._cond.notify_all()
+                        for waiter in [w for w in self._async_waiters if w[2] < seq]:
+                            self._async_waiters.discard(waiter)
+                            waiter[0].call_soon_threadsafe(_wake, waiter[1])
+                time.sleep(self.interval)
+        finally:
+            conn.close()
+
+def _wake(future):
+    if not future.done():
+        future.set_result(True)
+
+change_notifier = ChangeNotifier(app.config['CHANGES_POLL_INTERVAL'])
+os.register_at_fork(after_in_child=change_notifier.reset_after_fork)
+
+# Yielded by a response body instead of blocking, when the server says it
+# can take it (environ['asgi.change_wait'], set by asgi.py): the server
+# awaits wait() on its event loop, then carries on iterating the body.
+# Sends nothing itself.
+class ChangeWait:
+    def __init__(self, since, timeout):
+        self.since = since
+        self.timeout = timeout
+
+    def __len__(self):
+        return 0
+
+    async def wait(self):
+        return await change_notifier.wait_async(self.since, self.timeout)
+
+# Inside a response body: wait up to timeout for a change after since
+def await_change(since, timeout):
+    if request.environ.get('asgi.change_wait'):
+        yield ChangeWait(since, timeout)
+    else:
+        change_notifier.wait(since, timeout)
+
+def sse_event(event, data, id=None):
+    head = f'id: {id}\n' if id is not None else ''
+    return f'{head}event: {event}\ndata: {json_dumps(data)}\n\n'
+
+def stream_changes(since):
+    conn = get_db()
+    limit = app.config['CHANGES_LIMIT']
+    started = last_sent = time.monotonic()
+    yield 'retry: 3000\n\n'
+    while time.monotonic() - started < app.config['SSE_MAX_DURATION']:
+        if changes_trimmed(conn, since):
+            yield sse_event('reset', {})
+            return
+        changes = read_changes(conn, since, limit)
+        if changes:
+            for change in changes:
+                yield sse_event('change', change, id=change['seq'])
+            yield sse_event('count', {'count': student_count(conn)})
+            since = changes[-1]['seq']
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent >= app.config['SSE_HEARTBEAT']:
+            yield ': keepalive\n\n'
+            last_sent = time.monotonic()
+        else:
+            now = time.monotonic()
+            yield from await_change(since, min(app.config['SSE_HEARTBEAT'] - (now - last_sent),
+                                               app.config['SSE_MAX_DURATION'] - (now - started)))
+
+# Student Changes (GET)
+# ?since=<seq> returns the changes after seq (waiting up to ?wait= seconds
+# for one to arrive), plus the new last_seq and current count. Without
+# since it just reports last_seq, to start following from. With ?stream=1
+# or Accept: text/event-stream it is a Server-Sent Events stream instead
+# (resuming from Last-Event-ID on reconnect). 410 means the log no longer
+# reaches back to since: reload and start over.
+@app.route('/students/changes', methods=['GET'])
+def student_changes():
+    since = request.args.get('since', type=int)
+    if request.headers.get('Last-Event-ID', '').isdigit():
+        since = int(request.headers['Last-Event-ID'])
+    
+    if request.args.get('stream') in ('1', 'true') or request.accept_mimetypes.best == 'text/event-stream':
+        if since is None:
+            since = last_change_seq(get_db())
+        request.environ['slow_log.skip'] = True
+        release_admission()
+        return Response(stream_with_context(stream_changes(since)),
+                        mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    
+    conn = get_db()
+    if since is None:
+        return jsonify({'changes': [], 'last_seq': last_change_seq(conn), 'count': student_count(conn)})
+    if changes_trimmed(conn, since):
+        return jsonify({'error': 'since is older than the change log', 'last_seq': last_change_seq(conn)}), 410
+    
+    wait = min(max(request.args.get('wait', 0, type=float), 0), app.config['CHANGES_MAX_WAIT'])
+    changes = read_changes(conn, since, app.config['CHANGES_LIMIT'])
+    if changes or not wait:
+        return jsonify(changes_page(conn, since, changes))
+    
+    # Nothing yet: the answer is sent once change_notifier reports a change
+    # or the wait runs out
+    request.environ['slow_log.skip'] = True
+    release_admission()
+    return Response(stream_with_context(long_poll_changes(since, wait)), mimetype='application/json')
+
+def changes_page(conn, since, changes):
+    return {
+        'changes': changes,
+        'last_seq': changes[-1]['seq'] if changes else since,
+        'more': len(changes) == app.config['CHANGES_LIMIT'],
+        'count': student_count(conn)
+    }
+
+def long_poll_changes(since, wait):
+    yield from await_change(since, wait)
+    conn = get_db()
+    yield f'{json_dumps(changes_page(conn, since, read_changes(conn, since, app.config["CHANGES_LIMIT"])))}\n'
+
+# Prometheus scrape endpoint
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# The /debug endpoints expose query text and code paths: they need the
+# X-Profile token, and don't exist at all while PROFILE_TOKEN is unset
+def debug_only(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not app.config['PROFILE_TOKEN']:
+            return jsonify({'error': 'Not found'}), 404
+        if not has_profile_token(request.environ):
+            return jsonify({'error': 'X-Profile token required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+# Slow log of the worker process that answers (see SLOW_QUERY_THRESHOLD)
+@app.route('/debug/slow', methods=['GET'])
+@debug_only
+def slow_log():
+    return jsonify({
+        'pid': os.getpid(),
+        'query_threshold_ms': app.config['SLOW_QUERY_THRESHOLD'] * 1000,
+        'request_threshold_ms': app.config['SLOW_REQUEST_THRESHOLD'] * 1000,
+        'queries': list(slow_queries),
+        'requests': list(slow_requests),
+    })
+
+# Saved request profiles, newest first; shared by all workers
+@app.route('/debug/profiles', methods=['GET'])
+@debug_only
+def list_profiles():
+    directory = profile_dir()
+    try:
+        names = sorted((n for n in os.listdir(directory) if n.endswith('.folded')), reverse=True)
+    except FileNotFoundError:
+        names = []
+    profiles = []
+    for name in names:
+        try:
+            size = os.path.getsize(os.path.join(directory, name))
+        except FileNotFoundError:
+            continue
+        profiles.append({'name': name, 'size': size, 'url': f'/debug/profiles/{name}'})
+    return jsonify({'profiles': profiles})
+
+@app.route('/debug/profiles/<name>', methods=['GET'])
+@debug_only
+def get_profile(name):
+    return send_from_directory(profile_dir(), name, mimetype='text/plain')
 
 # 8. Export Students (GET)
+# ?format=json|ndjson|csv, ?gzip=1. The file is written straight from the
+# cursor as a chunked response, so the first byte goes out immediately and
+# only one batch of rows is held in memory. For large rosters prefer
+# POST /jobs/export, which doesn't hold a worker for the whole run.
 @app.route('/students/export', methods=['GET'])
 def export_students():
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM students')
-    students = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    
-    # Create JSON file in memory
-    json_data = json.dumps(students, indent=2)
-    buffer = io.BytesIO(json_data.encode('utf-8'))
-    buffer.seek(0)
-    
-    return send_file(
-        buffer,
-        mimetype='application/json',
-        as_attachment=True,
-        download_name=f'students_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
+    fmt = request.args.get('format', 'json')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unsupported format, expected one of: {", ".join(EXPORT_FORMATS)}'}), 400
+    mimetype, extension, streamer = EXPORT_FORMATS[fmt]
+    
+    cursor, encoder = export_query(get_db(), fmt)
+    body = streamer(cursor, encoder)
+    filename = f'students_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+    if request.args.get('gzip') in ('1', 'true'):
+        body = compress_stream(body, 'gzip')
+        mimetype = 'application/gzip'
+        filename += '.gz'
+    
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
     )
 
+# Bulk import helpers. NDJSON and CSV bodies are parsed line by line off the
+# request stream; every iterator yields (row number, record, parse error).
+IMPORT_FIELDS = ('name', 'grade', 'section', 'contact')
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/jsonl', 'application/json-seq')
+
+# Lines are split on b'\n' before decoding, so a UTF-8 sequence is never cut.
+# (Servers' input streams aren't all io objects, so no TextIOWrapper.)
+# Bytes that aren't UTF-8 decode to lone surrogates, so the rows holding
+# them fail validation rather than the whole import.
+def decode_lines(lines):
+    return (line.decode('utf-8', 'surrogateescape') for line in lines)
+
+def _request_text():
+    return decode_lines(iter(request.stream.readline, b''))
+
+def iter_ndjson_records(lines):
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json_loads(line), None
+        except ValueError:
+            yield number, None, 'Invalid JSON'
+
+def iter_csv_records(lines):
+    reader = csv.DictReader(lines)
+    while True:
+        try:
+            record = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as exc:
+            yield reader.line_num, None, f'Invalid CSV: {exc}'
+            continue
+        yield reader.line_num, record, None
+
+def validate_import_record(record, now):
+    if not isinstance(record, dict):
+        return None, 'Expected an object'
+    missing = [k for k in IMPORT_FIELDS if record.get(k) in (None, '')]
+    if missing:
+        return None, f'Missing required fields: {", ".join(missing)}'
+    values, error = check_student_fields(record)
+    if error is not None:
+        return None, error
+    return (values['name'], values['grade'], values['section'], values['contact'],
+            values.get('date_registered') or now), None
+
+# One transaction (and one fsync) per batch
+def insert_students(conn, rows, lock_timeout=None):
+    begin_write(conn, lock_timeout)
+    with conn:
+        conn.executemany(INSERT_STUDENT_SQL, rows)
+    return len(rows)
+
+# Validate and insert (row number, record, parse error) triples in
+# IMPORT_BATCH_SIZE transactions and return the import report.
+# progress(rows processed) is called after each batch and may raise to stop.
+# Only the first batch may give up on the write lock (503, nothing written,
+# safe to retry); once rows are committed the import waits its turn.
+def run_import(conn, records, progress=None):
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    batch_size = app.config['IMPORT_BATCH_SIZE']
+    max_errors = app.config['IMPORT_MAX_ERRORS']
+    started = time.perf_counter()
+    
+    batch = []
+    imported = 0
+    failed = 0
+    errors = []
+    lock_timeout = None
+    
+    for number, record, error in records:
+        if error is None:
+            row, error = validate_import_record(record, now)
+        if error is not None:
+            failed += 1
+            if len(errors) < max_errors:
+                errors.append({'row': number, 'error': error})
+            continue
+        batch.append(row)
+        if len(batch) >= batch_size:
+            imported += insert_students(conn, batch, lock_timeout)
+            lock_timeout = float('inf')
+            batch = []
+            if progress:
+                progress(imported + failed)
+    if batch:
+        imported += insert_students(conn, batch, lock_timeout)
+    
+    elapsed = time.perf_counter() - started
+    
+    return {
+        'imported': imported,
+        'failed': failed,
+        'errors': errors,
+        'errors_truncated': failed > len(errors),
+        'elapsed_seconds': round(elapsed, 3),
+        'rows_per_second': round(imported / elapsed, 1) if elapsed > 0 else None
+    }
+
 # 9. Import Students (POST)
+# Accepts a JSON array, or a streamed NDJSON / CSV body for large imports.
+# Rows that fail validation are reported back instead of silently skipped.
+# For large imports prefer POST /jobs/import.
 @app.route('/students/import', methods=['POST'])
 def import_students():
-    data = request.get_json()
+    if request.mimetype in NDJSON_MIMETYPES:
+        records = iter_ndjson_records(_request_text())
+    elif request.mimetype == 'text/csv':
+        records = iter_csv_records(_request_text())
+    else:
+        data = request.get_json()
+        if not isinstance(data, list):
+            return jsonify({'error': 'Expected a JSON array'}), 400
+        records = ((number, student, None) for number, student in enumerate(data, 1))
     
-    if not isinstance(data, list):
-        return jsonify({'error': 'Expected a JSON array'}), 400
+    report = run_import(get_db(), records)
+    read_cache.invalidate('students')
+    
+    return jsonify({'message': 'Students imported successfully', **report})
+
+# Batch operations: many create/update/delete/get operations in one
+# transaction, so N edits cost one round trip and one fsync. Consecutive
+# operations of the same kind run together (updates and deletes through
+# executemany); each operation still gets its own result.
+BATCH_OPERATIONS = ('create', 'update', 'delete', 'get')
+
+UPDATE_STUDENT_SQL = '''
+    UPDATE students
+    SET name = COALESCE(?, name), grade = COALESCE(?, grade),
+        section = COALESCE(?, section), contact = COALESCE(?, contact)
+    WHERE id = ?
+'''
+
+def fetch_students(conn, ids):
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return {}
+    placeholders = ','.join('?' * len(ids))
+    rows = conn.execute(f'SELECT * FROM students WHERE id IN ({placeholders})', ids).fetchall()
+    return {row['id']: row for row in rows}
+
+def validate_batch_operation(operation, now):
+    if not isinstance(operation, dict) or operation.get('op') not in BATCH_OPERATIONS:
+        return None, f'op must be one of: {", ".join(BATCH_OPERATIONS)}'
+    op = operation['op']
+    if op == 'create':
+        return validate_import_record(operation.get('data'), now)
+    id = operation.get('id')
+    if isinstance(id, bool) or not isinstance(id, int):
+        return None, 'id must be an integer'
+    if not fits_int64(id):
+        return None, 'id is out of range'
+    if op != 'update':
+        return id, None
+    changes, error = validate_student_changes(operation.get('data'))
+    if error is not None:
+        return None, error
+    return (changes.get('name'), changes.get('grade'), changes.get('section'),
+            changes.get('contact'), id), None
+
+def run_batch(conn, op, items, results):
+    if op == 'create':
+        # validate_import_record() has checked each row; a constraint that
+        # still fails undoes only its own statement, not the batch
+        cursor = conn.cursor()
+        for index, row in items:
+            try:
+                cursor.execute(INSERT_STUDENT_SQL, row)
+            except sqlite3.IntegrityError as exc:
+                results[index] = {'op': op, 'status': 400, 'error': str(exc)}
+                continue
+            results[index] = {'op': op, 'status': 201, 'id': cursor.lastrowid}
+        return []
+    
+    ids = [item[1] if op != 'update' else item[1][4] for item in items]
+    existing = fetch_students(conn, ids)
+    if op == 'get':
+        for index, id in items:
+            row = existing.get(id)
+            results[index] = ({'op': op, 'status': 200, 'student': dict(row)} if row else
+                              {'op': op, 'status': 404, 'id': id, 'error': 'Student not found'})
+        return []
+    
+    found = []
+    for index, id in zip((item[0] for item in items), ids):
+        if id in existing:
+            found.append(id)
+            results[index] = {'op': op, 'status': 200, 'id': id}
+            if op == 'delete':
+                del existing[id]
+        else:
+            results[index] = {'op': op, 'status': 404, 'id': id, 'error': 'Student not found'}
+    if op == 'update':
+        found_ids = set(found)
+        conn.executemany(UPDATE_STUDENT_SQL, [row for _, row in items if row[4] in found_ids])
+    else:
+        conn.executemany('DELETE FROM students WHERE id = ?', [(id,) for id in found])
+    return found
+
+# Batch Operations (POST)
+# Body: {"operations": [{"op": "update", "id": 1, "data": {...}}, ...],
+# "atomic": false}. With "atomic": true a single failed operation rolls the
+# whole batch back.
+@app.route('/students/batch', methods=['POST'])
+def batch_students():
+    body = request.get_json()
+    operations = body.get('operations') if isinstance(body, dict) else body
+    atomic = isinstance(body, dict) and bool(body.get('atomic'))
+    if not isinstance(operations, list):
+        return jsonify({'error': 'Expected a list of operations'}), 400
+    if len(operations) > app.config['BATCH_MAX_OPERATIONS']:
+        return jsonify({'error': f'At most {app.config["BATCH_MAX_OPERATIONS"]} operations per batch'}), 400
+    
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    results = [None] * len(operations)
+    runs = []
+    for index, operation in enumerate(operations):
+        item, error = validate_batch_operation(operation, now)
+        if error is not None:
+            op = operation.get('op') if isinstance(operation, dict) else None
+            results[index] = {'op': op, 'status': 400, 'error': error}
+            continue
+        if runs and runs[-1][0] == operation['op']:
+            runs[-1][1].append((index, item))
+        else:
+            runs.append((operation['op'], [(index, item)]))
     
     conn = get_db()
-    cursor = conn.cursor()
-    imported = 0
+    writes = any(op != 'get' for op, _ in runs)
+    if writes:
+        begin_write(conn)
+    touched = []
+    try:
+        for op, items in runs:
+            touched += run_batch(conn, op, items, results)
+    except Exception:
+        conn.rollback()
+        raise
     
-    for student in data:
-        if all(k in student for k in ('name', 'grade', 'section', 'contact')):
-            date_registered = student.get('date_registered', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
-            cursor.execute('''
-                INSERT INTO students (name, grade, section, contact, date_registered)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (student['name'], student['grade'], student['section'], student['contact'], date_registered))
-            imported += 1
+    failed = any(result['status'] >= 400 for result in results)
+    committed = writes and not (atomic and failed)
+    if committed:
+        conn.commit()
+        read_cache.invalidate('students', *(f'student:{id}' for id in touched))
+    elif conn.in_transaction:
+        conn.rollback()
     
-    conn.commit()
-    conn.close()
+    return jsonify({
+        'results': results,
+        'committed': committed
+    }), 409 if atomic and failed else 200
+
+# Bulk Get (GET): /students/batch?ids=1,2,3
+@app.route('/students/batch', methods=['GET'])
+@versioned
+def bulk_get_students():
+    try:
+        ids = [int(id) for id in request.args.get('ids', '').split(',') if id.strip()]
+    except ValueError:
+        return jsonify({'error': 'ids must be a comma-separated list of integers'}), 400
+    if not all(map(fits_int64, ids)):
+        return jsonify({'error': 'ids is out of range'}), 400
+    if len(ids) > app.config['BATCH_MAX_OPERATIONS']:
+        return jsonify({'error': f'At most {app.config["BATCH_MAX_OPERATIONS"]} ids per request'}), 400
+    
+    existing = fetch_students(get_db(), ids)
     
     return jsonify({
-        'message': 'Students imported successfully',
-        'imported': imported
+        'students': [dict(existing[id]) for id in dict.fromkeys(ids) if id in existing],
+        'missing': [id for id in dict.fromkeys(ids) if id not in existing]
     })
 
+# Background jobs: exports and imports that run on a small thread pool
+# (JOB_WORKERS per process) instead of inside the request. Job state lives
+# in the jobs table, so any worker can report on a job; files live in
+# JOB_DIR on local disk. Finished jobs are kept for JOB_RETENTION seconds,
+# and the oldest finished exports are evicted early once the directory
+# passes JOB_MAX_BYTES.
+JOB_KINDS = ('export', 'import')
+
+def create_jobs_table(conn):
+    execute_script(conn, '''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL,
+            params TEXT NOT NULL,
+            path TEXT,
+            filename TEXT,
+            mimetype TEXT,
+            size INTEGER,
+            rows_done INTEGER NOT NULL DEFAULT 0,
+            rows_total INTEGER,
+            result TEXT,
+            error TEXT,
+            pid INTEGER NOT NULL,
+            created REAL NOT NULL,
+            started REAL,
+            finished REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs(finished);
+    ''')
+
+def job_dir():
+    path = app.config['JOB_DIR'] or f'{DATABASE}-jobs'
+    os.makedirs(path, exist_ok=True)
+    return path
+
+class JobCancelled(Exception):
+    pass
+
+class JobRunner:
+    def __init__(self, workers):
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, job_id, fn, params):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='job')
+            self._executor.submit(self._run, job_id, fn, params)
+
+    def reset_after_fork(self):
+        self._executor = None
+        self._lock = threading.Lock()
+
+    # Each job gets its own connection for the work and another for its
+    # status row, so progress commits never touch the work's transaction
+    # or open cursor. progress() raises JobCancelled once the row has been
+    # marked cancelled.
+    def _run(self, job_id, fn, params):
+        conn = _connect()
+        status_conn = _connect()
+        try:
+            with status_conn:
+                claimed = status_conn.execute(
+                    "UPDATE jobs SET status = 'running', started = ? WHERE id = ? AND status = 'queued'",
+                    (time.time(), job_id)).rowcount
+            if not claimed:
+                return
+            last_update = [0.0]
+            
+            def progress(rows_done):
+                now = time.monotonic()
+                if now - last_update[0] < app.config['JOB_PROGRESS_INTERVAL']:
+                    return
+                last_update[0] = now
+                with status_conn:
+                    running = status_conn.execute(
+                        "UPDATE jobs SET rows_done = ? WHERE id = ? AND status = 'running'",
+                        (rows_done, job_id)).rowcount
+                if not running:
+                    raise JobCancelled()
+            
+            try:
+                rows_done, result = fn(conn, progress, params)
+            except JobCancelled:
+                remove_job_files(params)
+                return
+            except Exception as exc:
+                app.logger.exception('Job %s failed', job_id)
+                remove_job_files(params)
+                with status_conn:
+                    status_conn.execute(
+                        "UPDATE jobs SET status = 'failed', error = ?, finished = ? WHERE id = ?",
+                        (str(exc), time.time(), job_id))
+                return
+            with status_conn:
+                status_conn.execute('''
+                    UPDATE jobs SET status = 'done', rows_done = ?, result = ?, size = ?, finished = ?
+                    WHERE id = ? AND status = 'running'
+                ''', (rows_done, json_dumps(result), result.get('size'), time.time(), job_id))
+        finally:
+            try:
+                evict_jobs(status_conn)
+            finally:
+                conn.close()
+                status_conn.close()
+
+job_runner = JobRunner(app.config['JOB_WORKERS'])
+os.register_at_fork(after_in_child=job_runner.reset_after_fork)
+
+def remove_job_files(params):
+    for path in (params.get('path'), f'{params.get("path")}.part', params.get('upload')):
+        if path:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+# Drop jobs past their retention (including unfinished ones whose process
+# is gone), then the oldest finished exports while over JOB_MAX_BYTES
+def evict_jobs(conn):
+    cutoff = time.time() - app.config['JOB_RETENTION']
+    expired = [row for row in conn.execute(
+                   'SELECT id, params, status, pid FROM jobs WHERE COALESCE(finished, created) < ?', (cutoff,))
+               if row['status'] not in ('queued', 'running') or not _pid_alive(row['pid'])]
+    total = 0
+    for row in conn.execute("SELECT id, params, size FROM jobs WHERE status = 'done' AND size IS NOT NULL "
+                            'ORDER BY finished DESC').fetchall():
+        total += row['size']
+        if total > app.config['JOB_MAX_BYTES']:
+            expired.append(row)
+    if not expired:
+        return
+    for row in expired:
+        remove_job_files(json_loads(row['params']))
+    with conn:
+        conn.executemany('DELETE FROM jobs WHERE id = ?', [(row['id'],) for row in expired])
+
+# Counts rows as a streamer pulls them, for job progress
+class ProgressCursor:
+    def __init__(self, cursor, progress):
+        self.cursor = cursor
+        self.description = cursor.description
+        self.progress = progress
+        self.rows = 0
+
+    def fetchmany(self, size):
+        rows = self.cursor.fetchmany(size)
+        self.rows += len(rows)
+        self.progress(self.rows)
+        return rows
+
+def export_job(conn, progress, params):
+    cursor, encoder = export_query(conn, params['format'])
+    cursor = ProgressCursor(cursor, progress)
+    body = EXPORT_FORMATS[params['format']][2](cursor, encoder)
+    chunks = compress_stream(body, 'gzip') if params['gzip'] else (chunk.encode('utf-8') for chunk in body)
+    partial = f'{params["path"]}.part'
+    with open(partial, 'wb') as out:
+        for chunk in chunks:
+            out.write(chunk)
+    os.replace(partial, params['path'])
+    return cursor.rows, {'rows': cursor.rows, 'size': os.path.getsize(params['path'])}
+
+def import_job(conn, progress, params):
+    try:
+        with open(params['upload'], 'rb') as f:
+            if params['format'] == 'json':
+                data = json_loads(f.read())
+                if not isinstance(data, list):
+                    raise ValueError('Expected a JSON array')
+                records = ((number, student, None) for number, student in enumerate(data, 1))
+            else:
+                lines = decode_lines(f)
+                records = (iter_ndjson_records if params['format'] == 'ndjson' else iter_csv_records)(lines)
+            report = run_import(conn, records, progress)
+    finally:
+        read_cache.invalidate('students')
+        os.remove(params['upload'])
+    return report['imported'] + report['failed'], report
+
+def _insert_job(conn, job):
+    conn.execute(f'''
+        INSERT INTO jobs ({', '.join(job)}) VALUES ({', '.join('?' * len(job))})
+    ''', list(job.values()))
+
+def create_job(kind, params, rows_total=None, filename=None, mimetype=None):
+    job = {
+        'id': params['id'],
+        'kind': kind,
+        'status': 'queued',
+        'params': json_dumps(params),
+        'path': params.get('path'),
+        'filename': filename,
+        'mimetype': mimetype,
+        'rows_total': rows_total,
+        'pid': os.getpid(),
+        'created': time.time(),
+    }
+    evict_jobs(get_db())
+    execute_write(_insert_job, job)
+    job_runner.submit(job['id'], export_job if kind == 'export' else import_job, params)
+    return job_status(get_db(), job['id'])
+
+def _timestamp(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime('%Y-%m-%d %H:%M:%S') if epoch else None
+
+def job_status(conn, job_id):
+    row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    if row is None:
+        return None
+    status, error = row['status'], row['error']
+    if status in ('queued', 'running') and row['pid'] != os.getpid() and not _pid_alive(row['pid']):
+        status, error = 'failed', 'The worker running this job exited'
+    
+    rows_per_second = eta = None
+    if row['started']:
+        elapsed = (row['finished'] or time.time()) - row['started']
+        if elapsed > 0:
+            rows_per_second = round(row['rows_done'] / elapsed, 1)
+        if status == 'running' and rows_per_second and row['rows_total']:
+            eta = round(max(row['rows_total'] - row['rows_done'], 0) / rows_per_second, 1)
+    
+    job = {
+        'id': row['id'],
+        'kind': row['kind'],
+        'status': status,
+        'rows_done': row['rows_done'],
+        'rows_total': row['rows_total'],
+        'progress': (round(min(row['rows_done'] / row['rows_total'], 1), 4)
+                     if row['rows_total'] else (1.0 if status == 'done' else None)),
+        'rows_per_second': rows_per_second,
+        'eta_seconds': eta,
+        'created_at': _timestamp(row['created']),
+        'started_at': _timestamp(row['started']),
+        'finished_at': _timestamp(row['finished']),
+        'error': error,
+        'result': json_loads(row['result']) if row['result'] else None,
+        'status_url': f'/jobs/{row["id"]}',
+    }
+    if row['kind'] == 'export' and status == 'done':
+        job['download_url'] = f'/jobs/{row["id"]}/download'
+        job['size'] = row['size']
+    return job
+
+def _job_accepted(job):
+    response = jsonify(job)
+    response.status_code = 202
+    response.headers['Location'] = job['status_url']
+    return response
+
+# Export Job (POST): same ?format= and ?gzip= as /students/export. Poll
+# the returned status_url; when done, fetch download_url.
+@app.route('/jobs/export', methods=['POST'])
+def create_export_job():
+    fmt = request.args.get('format', 'json')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unsupported format, expected one of: {", ".join(EXPORT_FORMATS)}'}), 400
+    mimetype, extension, _ = EXPORT_FORMATS[fmt]
+    gzip = request.args.get('gzip') in ('1', 'true')
+    
+    job_id = secrets.token_urlsafe(12)
+    filename = f'students_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+    if gzip:
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    params = {
+        'id': job_id,
+        'format': fmt,
+        'gzip': gzip,
+        'path': os.path.join(job_dir(), f'{job_id}.{extension}{".gz" if gzip else ""}'),
+    }
+    return _job_accepted(create_job('export', params, student_count(get_db()), filename, mimetype))
+
+# Import Job (POST): same bodies as /students/import. The upload is
+# spooled to JOB_DIR, then imported in the background; the status's
+# result holds the usual import report.
+@app.route('/jobs/import', methods=['POST'])
+def create_import_job():
+    if request.mimetype in NDJSON_MIMETYPES:
+        fmt = 'ndjson'
+    elif request.mimetype == 'text/csv':
+        fmt = 'csv'
+    elif request.is_json:
+        fmt = 'json'
+    else:
+        return jsonify({'error': 'Expected a JSON array, NDJSON or CSV body'}), 415
+    
+    job_id = secrets.token_urlsafe(12)
+    upload = os.path.join(job_dir(), f'{job_id}.upload')
+    lines = 0
+    with open(upload, 'wb') as f:
+        for chunk in iter(functools.partial(request.stream.read, 1024 * 1024), b''):
+            f.write(chunk)
+            lines += chunk.count(b'\n')
+    rows_total = {'ndjson': lines, 'csv': max(lines - 1, 0), 'json': None}[fmt]
+    
+    params = {'id': job_id, 'format': fmt, 'upload': upload}
+    return _job_accepted(create_job('import', params, rows_total))
+
+# Job Status (GET) / Cancel or discard (DELETE). Cancelling an import
+# keeps the batches it has already committed.
+@app.route('/jobs/<job_id>', methods=['GET', 'DELETE'])
+def job_detail(job_id):
+    conn = get_db()
+    job = job_status(conn, job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if request.method == 'GET':
+        return jsonify(job)
+    
+    row = conn.execute('SELECT params FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    if job['status'] in ('queued', 'running'):
+        # The runner stops at its next progress update and cleans up
+        with conn:
+            conn.execute("UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ?", (time.time(), job_id))
+        return jsonify({'message': 'Job cancelled'})
+    remove_job_files(json_loads(row['params']))
+    with conn:
+        conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+    return jsonify({'message': 'Job deleted'})
+
+# Job Download (GET): the finished export file, with Range support for
+# resuming. Sent through the server's wsgi.file_wrapper, which gunicorn
+# turns into sendfile().
+@app.route('/jobs/<job_id>/download', methods=['GET'])
+def job_download(job_id):
+    row = get_db().execute("SELECT * FROM jobs WHERE id = ? AND kind = 'export'", (job_id,)).fetchone()
+    if row is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if row['status'] != 'done':
+        return jsonify({'error': f'Job is {row["status"]}'}), 409
+    try:
+        response = send_file(row['path'], mimetype=row['mimetype'], as_attachment=True,
+                             download_name=row['filename'], conditional=True, etag=job_id)
+    except FileNotFoundError:
+        return jsonify({'error': 'Export file has been evicted'}), 410
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
+
+# Static files and the index page are read, hashed and compressed once, at
+# startup, then served from memory. Asset URLs carry the content hash
+# (?v=), so those responses can be cached for a year; the page itself is
+# revalidated on each load, which costs a 304 while nothing has changed.
+STATIC_ROOT = os.path.join(app.root_path, 'static')
+mimetypes.add_type('font/woff', '.woff')
+mimetypes.add_type('font/woff2', '.woff2')
+
+def _compressible(mimetype):
+    return mimetype.startswith('text/') or mimetype in (
+        'application/javascript', 'application/json', 'image/svg+xml')
+
+class StaticAsset:
+    def __init__(self, data, mimetype):
+        self.mimetype = mimetype
+        self.version = hashlib.sha256(data).hexdigest()[:16]
+        self.bodies = {None: data}
+        if _compressible(mimetype):
+            for encoding in ENCODINGS:
+                encoded = compress(data, encoding, best=True)
+                if len(encoded) < len(data):
+                    self.bodies[encoding] = encoded
+    
+    def response(self, max_age=None):
+        encoding = preferred_encoding(self.bodies)
+        response = Response(self.bodies[encoding], mimetype=self.mimetype)
+        if encoding:
+            response.content_encoding = encoding
+        if len(self.bodies) > 1:
+            response.vary.add('Accept-Encoding')
+        response.set_etag(f'{self.version}-{encoding}' if encoding else self.version)
+        if max_age:
+            response.cache_control.public = True
+            response.cache_control.max_age = max_age
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+static_assets = {}
+index_page = None
+
+def load_static_assets():
+    global index_page
+    static_assets.clear()
+    for root, _, files in os.walk(STATIC_ROOT):
+        for name in files:
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            static_assets[os.path.relpath(path, STATIC_ROOT).replace(os.sep, '/')] = StaticAsset(data, mimetype)
+    html = app.jinja_env.from_string(HTML_TEMPLATE).render(
+        live_updates=app.config['LIVE_UPDATES'],
+        asset_url=asset_url,
+    )
+    index_page = StaticAsset(html.encode('utf-8'), 'text/html')
+
+def asset_url(path):
+    return f'/static/{path}?v={static_assets[path].version}'
+
+@app.route('/static/<path:filename>', methods=['GET'])
+def static_file(filename):
+    asset = static_assets.get(filename)
+    if asset is None:
+        return jsonify({'error': 'Not found'}), 404
+    versioned_url = request.args.get('v') == asset.version
+    return asset.response(app.config['STATIC_MAX_AGE'] if versioned_url else None)
+
 # Frontend HTML
 @app.route('/')
 def index():
-    return render_template_string(HTML_TEMPLATE)
+    return index_page.response()
 
 HTML_TEMPLATE = '''
 <!DOCTYPE html>
@@ -212,13 +3009,16 @@ HTML_TEMPLATE = '''
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Student Manager</title>
-    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
-    <link href="https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.0/font/bootstrap-icons.css" rel="stylesheet">
+    <link href="{{ asset_url('vendor/bootstrap/bootstrap.min.css') }}" rel="stylesheet">
+    <link href="{{ asset_url('vendor/bootstrap-icons/bootstrap-icons.min.css') }}" rel="stylesheet">
     <style>
         body { padding-top: 20px; background: #f8f9fa; }
         .card { box-shadow: 0 2px 4px rgba(0,0,0,0.1); margin-bottom: 20px; }
         .btn-action { margin: 2px; }
         .student-count { font-size: 1.2rem; font-weight: bold; color: #0d6efd; }
+        .table-viewport { height: 65vh; overflow-y: auto; }
+        .table-viewport thead th { position: sticky; top: 0; z-index: 1; }
+        .table-viewport td { white-space: nowrap; }
         @media (max-width: 768px) {
             .table-responsive { font-size: 0.9rem; }
         }
@@ -297,7 +3097,7 @@ HTML_TEMPLATE = '''
                         </div>
 
                         <!-- Table -->
-                        <div class="table-responsive">
+                        <div class="table-responsive table-viewport" id="tableViewport">
                             <table class="table table-striped table-hover">
                                 <thead class="table-dark">
                                     <tr>
@@ -317,6 +3117,7 @@ HTML_TEMPLATE = '''
                                 </tbody>
                             </table>
                         </div>
+                        <div class="small text-muted mt-2" id="tableStatus"></div>
                     </div>
                 </div>
             </div>
@@ -360,15 +3161,47 @@ HTML_TEMPLATE = '''
         </div>
     </div>
 
-    <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js"></script>
+    <script src="{{ asset_url('vendor/bootstrap/bootstrap.min.js') }}"></script>
     <script>
         let editModal;
 
+        // Change feed: 'poll' asks /students/changes for what changed since
+        // lastSeq every few seconds; 'sse' keeps an EventSource open instead
+        const LIVE_UPDATES = '{{ live_updates }}';
+        const POLL_INTERVAL = 3000;
+        const HIDDEN_POLL_INTERVAL = 15000;
+        let lastSeq = 0;
+        let syncing = null;
+        let pollTimer = null;
+        let changeSource = null;
+
+        // Table: the roster is fetched one keyset page at a time as the user
+        // scrolls, and only the rows near the viewport are in the DOM
+        const PAGE_SIZE = 200;
+        const OVERSCAN = 10;
+        const SEARCH_DELAY = 250;
+        const PAGE_CACHE_SIZE = 50;
+        let rowHeight = 45;
+        let renderQueued = false;
+        let totalCount = 0;
+        let roster = newRoster();
+        // While a search is showing, its results replace the roster in the view
+        let search = null;
+        let searchTimer = null;
+        let searchController = null;
+        // Responses by URL, dropped whenever the feed reports a change
+        const pageCache = new Map();
+
         // Initialize
-        document.addEventListener('DOMContentLoaded', function() {
+        document.addEventListener('DOMContentLoaded', async function() {
             editModal = new bootstrap.Modal(document.getElementById('editModal'));
+            document.getElementById('tableViewport').addEventListener('scroll', scheduleRender, { passive: true });
+            window.addEventListener('resize', scheduleRender);
+            // Take the feed position before the list, so nothing written in
+            // between is missed (replaying a change is harmless)
+            await startFeed();
             loadStudents();
-            updateCount();
+            followChanges();
 
             // Add student form submit
             document.getElementById('addStudentForm').addEventListener('submit', async (e) => {
@@ -376,44 +3209,126 @@ HTML_TEMPLATE = '''
                 await addStudent();
             });
 
-            // Search functionality
+            // Search functionality: one request once typing pauses
             document.getElementById('searchInput').addEventListener('input', (e) => {
-                if (e.target.value) {
-                    searchStudents(e.target.value);
-                } else {
-                    loadStudents();
-                }
+                clearTimeout(searchTimer);
+                searchTimer = setTimeout(() => searchStudents(e.target.value.trim()), SEARCH_DELAY);
             });
         });
 
-        // Load all students
-        async function loadStudents() {
-            try {
-                const response = await fetch('/students');
-                const students = await response.json();
-                displayStudents(students);
-                updateCount();
-            } catch (error) {
-                console.error('Error:', error);
-                showAlert('Error loading students', 'danger');
+        function newRoster() {
+            return { students: [], ids: new Set(), nextCursor: null, loading: null, complete: false };
+        }
+
+        // GET a JSON response, served from pageCache when possible
+        async function cachedFetch(url, options = {}) {
+            if (pageCache.has(url)) {
+                const data = pageCache.get(url);
+                pageCache.delete(url);
+                pageCache.set(url, data);
+                return data;
             }
+            const response = await fetch(url, options);
+            if (!response.ok) throw new Error(`${url}: ${response.status}`);
+            const data = await response.json();
+            pageCache.set(url, data);
+            if (pageCache.size > PAGE_CACHE_SIZE) pageCache.delete(pageCache.keys().next().value);
+            return data;
         }
 
-        // Display students in table
-        function displayStudents(students) {
+        // Load students from the first page
+        async function loadStudents() {
+            roster = newRoster();
+            scheduleRender();
+            await loadNextPage();
+        }
+
+        function loadNextPage() {
+            if (roster.loading || roster.complete) return roster.loading;
+            const target = roster;
+            const after = target.nextCursor ? `&after=${target.nextCursor}` : '';
+            target.loading = (async () => {
+                try {
+                    const page = await cachedFetch(`/students?limit=${PAGE_SIZE}${after}`);
+                    // Rows the feed already added are skipped
+                    for (const s of page.students) {
+                        if (!target.ids.has(s.id)) {
+                            target.ids.add(s.id);
+                            target.students.push(s);
+                        }
+                    }
+                    target.nextCursor = page.next_cursor;
+                    target.complete = !page.next_cursor;
+                } catch (error) {
+                    console.error('Error:', error);
+                    showAlert('Error loading students', 'danger');
+                } finally {
+                    target.loading = null;
+                    scheduleRender();
+                }
+            })();
+            return target.loading;
+        }
+
+        function scheduleRender() {
+            if (renderQueued) return;
+            renderQueued = true;
+            requestAnimationFrame(() => {
+                renderQueued = false;
+                renderWindow();
+            });
+        }
+
+        // Render the rows in and around the viewport; spacer rows stand in
+        // for the rest, so the DOM stays the same size however many students
+        // are loaded
+        function renderWindow() {
+            const viewport = document.getElementById('tableViewport');
             const tbody = document.getElementById('studentsTable');
-            if (students.length === 0) {
-                tbody.innerHTML = '<tr><td colspan="7" class="text-center">No students found</td></tr>';
-                return;
+            const rows = search ? search.students : roster.students;
+
+            if (rows.length === 0) {
+                tbody.innerHTML = !search && !roster.complete ? LOADING_ROW : EMPTY_ROW;
+            } else {
+                let first = Math.max(0, Math.floor(viewport.scrollTop / rowHeight) - OVERSCAN);
+                first -= first % 2;   // keeps the table stripes from flickering
+                const last = Math.min(rows.length, Math.ceil((viewport.scrollTop + viewport.clientHeight) / rowHeight) + OVERSCAN);
+                tbody.innerHTML = spacer(first * rowHeight) +
+                    rows.slice(first, last).map(renderRow).join('') +
+                    spacer((rows.length - last) * rowHeight);
+
+                const sample = tbody.querySelector('tr[data-id]');
+                if (sample && sample.offsetHeight && sample.offsetHeight !== rowHeight) {
+                    rowHeight = sample.offsetHeight;
+                    scheduleRender();
+                }
+                if (!search && last >= rows.length - OVERSCAN) loadNextPage();
             }
 
-            tbody.innerHTML = students.map(s => `
-                <tr>
+            document.getElementById('tableStatus').textContent = search
+                ? `${rows.length} matching "${search.query}"`
+                : `Showing ${rows.length} of ${Math.max(totalCount, rows.length)}`;
+        }
+
+        const EMPTY_ROW = '<tr><td colspan="7" class="text-center">No students found</td></tr>';
+        const LOADING_ROW = '<tr><td colspan="7" class="text-center">Loading...</td></tr>';
+
+        function spacer(height) {
+            return `<tr aria-hidden="true" style="height: ${height}px"></tr>`;
+        }
+
+        function escapeHtml(value) {
+            return String(value).replace(/[&<>"']/g, c => `&#${c.charCodeAt(0)};`);
+        }
+
+        function renderRow(s) {
+            return `
+                <tr data-id="${s.id}">
                     <td>${s.id}</td>
-                    <td>${s.name}</td>
-                    <td>${s.grade}</td>
-                    <td>${s.section}</td>
-                    <td>${s.contact}</td>
+                    <td>${escapeHtml(s.name)}</td>
+                    <td>${escapeHtml(s.grade)}</td>
+                    <td>${escapeHtml(s.section)}</td>
+                    <td>${escapeHtml(s.contact)}</td>
                     <td>${new Date(s.date_registered).toLocaleDateString()}</td>
                     <td>
                         <button class="btn btn-sm btn-warning btn-action" onclick="openEditModal(${s.id})">
@@ -424,7 +3339,111 @@ HTML_TEMPLATE = '''
                         </button>
                     </td>
                 </tr>
-            `).join('');
+            `;
+        }
+
+        // Apply one change from the feed to the loaded rows. New students go
+        // to the top of the roster (it is newest first) but not into search
+        // results, which are only refreshed by searching again.
+        function applyChange(change) {
+            lastSeq = Math.max(lastSeq, change.seq);
+            pageCache.clear();
+            for (const list of search ? [roster.students, search.students] : [roster.students]) {
+                const index = list.findIndex(s => s.id === change.id);
+                if (index === -1) continue;
+                if (change.student) {
+                    list[index] = change.student;
+                } else {
+                    list.splice(index, 1);
+                }
+            }
+            if (change.op === 'insert' && change.student && !roster.ids.has(change.id)) {
+                roster.ids.add(change.id);
+                roster.students.unshift(change.student);
+            }
+            scheduleRender();
+        }
+
+        function setCount(count) {
+            totalCount = count;
+            document.getElementById('studentCount').textContent = count;
+            scheduleRender();
+        }
+
+        // Current feed position and count, without any changes
+        async function startFeed() {
+            try {
+                const response = await fetch('/students/changes');
+                const data = await response.json();
+                lastSeq = data.last_seq;
+                setCount(data.count);
+            } catch (error) {
+                console.error('Error:', error);
+            }
+        }
+
+        // The change log no longer reaches back to lastSeq: start over
+        async function resetFeed() {
+            pageCache.clear();
+            await startFeed();
+            await loadStudents();
+        }
+
+        // Fetch and apply everything since lastSeq
+        function syncChanges() {
+            if (changeSource) return Promise.resolve();
+            if (!syncing) {
+                syncing = (async () => {
+                    try {
+                        let more = true;
+                        while (more) {
+                            const response = await fetch(`/students/changes?since=${lastSeq}`);
+                            if (response.status === 410) {
+                                await resetFeed();
+                                return;
+                            }
+                            const data = await response.json();
+                            data.changes.forEach(applyChange);
+                            lastSeq = Math.max(lastSeq, data.last_seq);
+                            setCount(data.count);
+                            more = data.more;
+                        }
+                    } catch (error) {
+                        console.error('Error:', error);
+                    } finally {
+                        syncing = null;
+                    }
+                })();
+            }
+            return syncing;
+        }
+
+        function followChanges() {
+            if (LIVE_UPDATES === 'sse' && window.EventSource) {
+                // On reconnect the browser resumes from the last event id
+                changeSource = new EventSource(`/students/changes?stream=1&since=${lastSeq}`);
+                changeSource.addEventListener('change', e => applyChange(JSON.parse(e.data)));
+                changeSource.addEventListener('count', e => setCount(JSON.parse(e.data).count));
+                changeSource.addEventListener('reset', async () => {
+                    changeSource.close();
+                    changeSource = null;
+                    await resetFeed();
+                    followChanges();
+                });
+                return;
+            }
+            const poll = async () => {
+                pollTimer = null;
+                await syncChanges();
+                pollTimer = setTimeout(poll, document.hidden ? HIDDEN_POLL_INTERVAL : POLL_INTERVAL);
+            };
+            document.addEventListener('visibilitychange', () => {
+                if (!document.hidden && pollTimer) {
+                    clearTimeout(pollTimer);
+                    poll();
+                }
+            });
+            pollTimer = setTimeout(poll, POLL_INTERVAL);
         }
 
         // Add student
@@ -446,7 +3465,7 @@ HTML_TEMPLATE = '''
                 if (response.ok) {
                     showAlert('Student added successfully!', 'success');
                     document.getElementById('addStudentForm').reset();
-                    loadStudents();
+                    syncChanges();
                 } else {
                     showAlert('Error adding student', 'danger');
                 }
@@ -495,7 +3514,7 @@ HTML_TEMPLATE = '''
                 if (response.ok) {
                     showAlert('Student updated successfully!', 'success');
                     editModal.hide();
-                    loadStudents();
+                    syncChanges();
                 } else {
                     showAlert('Error updating student', 'danger');
                 }
@@ -514,7 +3533,7 @@ HTML_TEMPLATE = '''
                 
                 if (response.ok) {
                     showAlert('Student deleted successfully!', 'success');
-                    loadStudents();
+                    syncChanges();
                 } else {
                     showAlert('Error deleting student', 'danger');
                 }
@@ -524,26 +3543,28 @@ HTML_TEMPLATE = '''
             }
         }
 
-        // Search students
-        async function searchStudents(name) {
-            try {
-                const response = await fetch(`/students/search?name=${encodeURIComponent(name)}`);
-                const students = await response.json();
-                displayStudents(students);
-            } catch (error) {
-                console.error('Error:', error);
-                showAlert('Error searching students', 'danger');
+        // Search students. A newer query aborts the one still in flight.
+        async function searchStudents(query) {
+            if (searchController) searchController.abort();
+            searchController = null;
+            document.getElementById('tableViewport').scrollTop = 0;
+            if (!query) {
+                search = null;
+                scheduleRender();
+                return;
             }
-        }
-
-        // Update count
-        async function updateCount() {
+            
+            const controller = searchController = new AbortController();
             try {
-                const response = await fetch('/students/count');
-                const data = await response.json();
-                document.getElementById('studentCount').textContent = data.count;
+                const students = await cachedFetch(`/students/search?name=${encodeURIComponent(query)}`,
+                                                   { signal: controller.signal });
+                if (controller !== searchController) return;
+                search = { query, students: students.slice() };
+                scheduleRender();
             } catch (error) {
+                if (error.name === 'AbortError') return;
                 console.error('Error:', error);
+                showAlert('Error searching students', 'danger');
             }
         }
 
@@ -571,6 +3592,11 @@ HTML_TEMPLATE = '''
 </html>
 '''
 
-if __name__ == '__main__':
+load_static_assets()
+
+# Apply pending migrations on load, i.e. once at every gunicorn worker boot
+if app.config['AUTO_MIGRATE']:
     init_db()
+
+if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
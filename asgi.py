@@ -0,0 +1,186 @@
+# ASGI entry point. Serves the same Flask app (same routes, same payloads)
+# from an asyncio event loop:
+#
+#     uvicorn asgi:app
+#     gunicorn asgi:app -k uvicorn.workers.UvicornWorker
+#
+# The Flask view, and with it every SQLite call, runs on a bounded thread
+# pool. Everything that is just waiting - reading a slow upload, writing a
+# long download to a slow client, idle connections - happens on the event
+# loop, and so does a change-feed follower waiting for the next change
+# (see ChangeWait in app.py), so one process holds thousands of connections
+# with only ASGI_DB_THREADS threads. Once ASGI_MAX_PENDING requests are in
+# flight new ones are turned away with 503 instead of queueing without bound.
+import asyncio
+import contextvars
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app as flask_app, ChangeWait, close_all_connections, group_writer
+
+DB_THREADS = int(os.environ.get('ASGI_DB_THREADS', 16))
+MAX_PENDING = int(os.environ.get('ASGI_MAX_PENDING', 1024))
+BODY_SPOOL_SIZE = 1024 * 1024   # request bodies beyond this go to disk
+
+_END = object()
+
+class WSGIOnLoop:
+    def __init__(self, wsgi_app, threads, max_pending):
+        self.wsgi_app = wsgi_app
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix='db')
+        self.pending = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            if self.pending >= self.max_pending:
+                await self.reject(send)
+                return
+            self.pending += 1
+            try:
+                await self.handle(scope, receive, send)
+            finally:
+                self.pending -= 1
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(self.executor, group_writer.stop)
+                self.executor.shutdown(wait=True)
+                close_all_connections()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def reject(self, send):
+        body = b'{"error":"Server busy, retry shortly"}'
+        await send({
+            'type': 'http.response.start',
+            'status': 503,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode('ascii')),
+                (b'retry-after', b'1'),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def handle(self, scope, receive, send):
+        body = await self.read_body(receive)
+        environ = self.build_environ(scope, body)
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+            return lambda data: None
+
+        # Every step of this request runs in one contextvars.Context, so a
+        # streamed response can be resumed from any pool thread and still
+        # see (and finally pop) the request context it started with.
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+
+        def run(fn, *args):
+            return loop.run_in_executor(self.executor, context.run, fn, *args)
+
+        # The next chunk of the body, or _END once it's done or the client
+        # has gone. A body that would sit waiting for the change feed
+        # yields a ChangeWait instead; it's awaited here, off the pool, and
+        # given up on as soon as the client disconnects.
+        async def next_chunk():
+            while not disconnected.done():
+                chunk = await run(next, iterator, _END)
+                if not isinstance(chunk, ChangeWait):
+                    return chunk
+                waiting = asyncio.ensure_future(chunk.wait())
+                await asyncio.wait({waiting, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                waiting.cancel()
+            return _END
+
+        disconnected = asyncio.ensure_future(self.wait_for_disconnect(receive))
+        result = await run(self.wsgi_app, environ, start_response)
+        try:
+            iterator = iter(result)
+            chunk = await next_chunk()
+            await send({
+                'type': 'http.response.start',
+                'status': response['status'],
+                'headers': response['headers'],
+            })
+            while chunk is not _END:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                chunk = await next_chunk()
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            # Also reached when the client left mid-stream: closing ends the
+            # body there rather than when it runs out, freeing its connection
+            disconnected.cancel()
+            if hasattr(result, 'close'):
+                await run(result.close)
+            body.close()
+
+    # After the request body, the only message left to come is the
+    # disconnect (servers send it once the response is complete, too)
+    async def wait_for_disconnect(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def read_body(self, receive):
+        body = tempfile.SpooledTemporaryFile(max_size=BODY_SPOOL_SIZE)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        body.seek(0)
+        return body
+
+    def build_environ(self, scope, body):
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope['query_string'].decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f'HTTP/{scope["http_version"]}',
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'CONTENT_LENGTH': str(body.seek(0, os.SEEK_END)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+            'asgi.change_wait': True,
+        }
+        body.seek(0)
+        for name, value in scope['headers']:
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif name == 'CONTENT_LENGTH':
+                continue
+            else:
+                key = f'HTTP_{name}'
+                environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+app = WSGIOnLoop(flask_app, DB_THREADS, MAX_PENDING)
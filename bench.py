@@ -0,0 +1,413 @@
+# Benchmark / load-test suite for the student endpoints.
+#
+# Seeds synthetic rosters of several sizes into temporary databases, drives
+# every endpoint through the Flask test client and/or a local gunicorn
+# process at a configurable concurrency, and reports req/s, p50/p95/p99
+# latency, CPU time per request and peak RSS as JSON. Results can be stored as a baseline and
+# later runs compared against it; a regression makes the exit status 1.
+# Peak RSS is sampled while each scenario runs (of this process in client
+# mode, of the gunicorn tree otherwise; Linux only), with rss_growth_kib
+# the rise over where the scenario started.
+#
+#     python bench.py --sizes 10000,100000 --mode both --concurrency 8
+#     python bench.py --sizes 10000 --save-baseline bench_baseline.json
+#     python bench.py --sizes 10000 --baseline bench_baseline.json
+#
+# --json-encoder stdlib runs the app on the json module and the Python row
+# encoder, to measure what orjson / SQLite-side encoding saves:
+#
+#     python bench.py --sizes 100000 --no-cache --json-encoder stdlib \
+#         --scenarios get_all_students_full,search_students,export_students_json
+#
+# Seeding 1M rows takes a while (every insert also feeds the search index
+# and rollup triggers); pass --data-dir to seed once and reuse the files.
+import argparse
+import functools
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SYLLABLES = ('an', 'be', 'ca', 'da', 'el', 'fi', 'ga', 'ho', 'is', 'jo', 'ka', 'li',
+             'ma', 'no', 'ol', 'pa', 'ri', 'sa', 'te', 'ul', 'vi', 'wa', 'ya', 'zo')
+SECTIONS = tuple('ABCDEFGH')
+
+def fake_name(rng):
+    first = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).title()
+    last = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).title()
+    return f'{first} {last}'
+
+def fake_student(rng):
+    day = rng.randint(0, 364)
+    return {
+        'name': fake_name(rng),
+        'grade': rng.randint(1, 12),
+        'section': rng.choice(SECTIONS),
+        'contact': f'09{rng.randint(100000000, 999999999)}',
+        'date_registered': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(1735689600 + day * 86400)),
+    }
+
+# Build a roster of `size` rows at `path` using the app's own schema
+def seed_database(app_module, path, size, seed=1234):
+    app_module.DATABASE = path
+    app_module.init_db()
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    started = time.perf_counter()
+    batch = 10000
+    with conn:
+        for offset in range(0, size, batch):
+            rows = [fake_student(rng) for _ in range(min(batch, size - offset))]
+            conn.executemany(
+                'INSERT INTO students (name, grade, section, contact, date_registered) VALUES (?, ?, ?, ?, ?)',
+                [(r['name'], r['grade'], r['section'], r['contact'], r['date_registered']) for r in rows])
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.close()
+    return time.perf_counter() - started
+
+def prepare_database(app_module, size, data_dir, work_dir):
+    target = os.path.join(work_dir, f'bench_{size}.db')
+    if data_dir:
+        cached = os.path.join(data_dir, f'students_{size}.db')
+        if not os.path.exists(cached):
+            print(f'seeding {size} rows into {cached}', file=sys.stderr)
+            seed_database(app_module, cached, size)
+        shutil.copyfile(cached, target)
+    else:
+        print(f'seeding {size} rows', file=sys.stderr)
+        seed_database(app_module, target, size)
+    return target
+
+# Scenarios: name -> function(rng, size) returning (method, path, body, content type)
+def _ndjson_batch(rng, count=500):
+    return ''.join(json.dumps(fake_student(rng)) + '\n' for _ in range(count)).encode('utf-8')
+
+SCENARIOS = {
+    'add_student': lambda rng, size: (
+        'POST', '/student', json.dumps(fake_student(rng)).encode('utf-8'), 'application/json'),
+    'get_student': lambda rng, size: (
+        'GET', f'/student/{rng.randint(1, size)}', None, None),
+    'get_all_students_page': lambda rng, size: (
+        'GET', '/students?limit=100', None, None),
+    'get_all_students_full': lambda rng, size: (
+        'GET', '/students', None, None),
+    'search_students': lambda rng, size: (
+        'GET', f'/students/search?name={rng.choice(SYLLABLES)}{rng.choice(SYLLABLES)}', None, None),
+    'count_students': lambda rng, size: (
+        'GET', '/students/count', None, None),
+    'export_students': lambda rng, size: (
+        'GET', '/students/export?format=ndjson', None, None),
+    'export_students_json': lambda rng, size: (
+        'GET', '/students/export?format=json', None, None),
+    'import_students': lambda rng, size: (
+        'POST', '/students/import', _ndjson_batch(rng), 'application/x-ndjson'),
+}
+
+# Requests per scenario default to this, scaled down for the heavy ones
+HEAVY_SCENARIOS = {'get_all_students_full', 'export_students', 'export_students_json', 'import_students'}
+
+def summarize(latencies, errors, elapsed, cpu):
+    summary = {
+        'requests': len(latencies),
+        'errors': errors,
+        'elapsed_seconds': round(elapsed, 4),
+        'requests_per_second': round(len(latencies) / elapsed, 2) if elapsed > 0 else None,
+        'cpu_ms_per_request': round(cpu * 1000 / len(latencies), 3) if latencies else None,
+    }
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+        summary.update({
+            'p50_ms': round(cuts[49] * 1000, 3),
+            'p95_ms': round(cuts[94] * 1000, 3),
+            'p99_ms': round(cuts[98] * 1000, 3),
+        })
+    return summary
+
+# cpu_clock() returns the CPU seconds used so far by whatever serves the
+# requests: this process in client mode (so it includes the test client's
+# own share), the gunicorn process tree otherwise
+def drive(send, cpu_clock, scenario, size, requests, concurrency, seed):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        local = []
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    break
+            method, path, body, content_type = SCENARIOS[scenario](rng, size)
+            started = time.perf_counter()
+            ok = send(method, path, body, content_type)
+            local.append(time.perf_counter() - started)
+            if not ok:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            latencies.extend(local)
+
+    started = time.perf_counter()
+    cpu_started = cpu_clock()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    return summarize(latencies, errors[0], time.perf_counter() - started, cpu_clock() - cpu_started)
+
+# Flask test client, in-process; the whole body is consumed like a real client would
+def client_sender(app_module):
+    local = threading.local()
+
+    def send(method, path, body, content_type):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app_module.app.test_client()
+        response = client.open(path, method=method, data=body, content_type=content_type, buffered=True)
+        response.get_data()
+        response.close()
+        return response.status_code < 400
+    return send
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_gunicorn(database, workers, threads):
+    port = free_port()
+    env = dict(os.environ, DATABASE=database)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'app:app', '-b', f'127.0.0.1:{port}',
+         '-w', str(workers), '--threads', str(threads), '--log-level', 'warning'],
+        cwd=ROOT, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process, port
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError('gunicorn did not start')
+
+def http_sender(port):
+    local = threading.local()
+
+    def send(method, path, body, content_type):
+        headers = {'Content-Type': content_type} if content_type else {}
+        for attempt in range(2):
+            conn = getattr(local, 'conn', None)
+            if conn is None:
+                conn = local.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if response.will_close:
+                    conn.close()
+                    local.conn = None
+                return response.status < 400
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                local.conn = None
+        return False
+    return send
+
+# A process and all its descendants; Linux only
+def process_tree(pid):
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        yield current
+        try:
+            with open(f'/proc/{current}/task/{current}/children') as children:
+                pending.extend(int(child) for child in children.read().split())
+        except OSError:
+            continue
+
+# Current RSS (VmRSS) of a process tree, in KiB
+def tree_rss(pid):
+    total = 0
+    for current in process_tree(pid):
+        try:
+            with open(f'/proc/{current}/status') as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+        except OSError:
+            continue
+    return total or None
+
+# Sample a process tree's RSS while one scenario runs. The kernel's
+# high-water mark (VmHWM, ru_maxrss) covers the whole process lifetime,
+# seeding and earlier scenarios included, so it can't be used per scenario.
+# Returns a function that stops sampling and gives (start, peak) in KiB.
+def track_rss(pid, interval=0.02):
+    start = tree_rss(pid)
+    peak = [start or 0]
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(interval):
+            peak[0] = max(peak[0], tree_rss(pid) or 0)
+
+    thread = threading.Thread(target=sample, daemon=True)
+    thread.start()
+
+    def finish():
+        stop.set()
+        thread.join()
+        return start, max(peak[0], tree_rss(pid) or 0) or None
+    return finish
+
+# User + system CPU seconds of a process tree (workers still running)
+def tree_cpu_seconds(pid):
+    ticks = 0
+    for current in process_tree(pid):
+        try:
+            with open(f'/proc/{current}/stat') as stat:
+                fields = stat.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        ticks += int(fields[11]) + int(fields[12])   # utime, stime
+    return ticks / os.sysconf('SC_CLK_TCK')
+
+def run(args):
+    work_dir = tempfile.mkdtemp(prefix='students_bench_')
+    # Importing app migrates DATABASE; keep that away from the real one
+    os.environ['DATABASE'] = os.path.join(work_dir, 'bootstrap.db')
+    os.environ['JSON_ENCODER'] = args.json_encoder
+    sys.path.insert(0, ROOT)
+    import app as app_module
+    app_module.app.config['GROUP_COMMIT'] = args.group_commit
+    if args.no_cache:
+        app_module.read_cache.max_entries = 0
+
+    scenarios = args.scenarios.split(',') if args.scenarios else list(SCENARIOS)
+    modes = ['client', 'gunicorn'] if args.mode == 'both' else [args.mode]
+    results = {}
+    try:
+        for size in (int(s) for s in args.sizes.split(',')):
+            database = prepare_database(app_module, size, args.data_dir, work_dir)
+            for mode in modes:
+                if mode == 'client':
+                    app_module.close_all_connections()
+                    app_module.read_cache.clear()
+                    app_module.DATABASE = database
+                    send, process = client_sender(app_module), None
+                    cpu_clock = time.process_time
+                else:
+                    process, port = start_gunicorn(database, args.workers, args.threads)
+                    send = http_sender(port)
+                    cpu_clock = functools.partial(tree_cpu_seconds, process.pid)
+                try:
+                    for scenario in scenarios:
+                        requests = args.requests
+                        if scenario in HEAVY_SCENARIOS:
+                            requests = max(args.concurrency, requests // 20)
+                        print(f'{mode} size={size} {scenario} x{requests}', file=sys.stderr)
+                        rss = track_rss(os.getpid() if process is None else process.pid)
+                        summary = drive(send, cpu_clock, scenario, size, requests, args.concurrency, args.seed)
+                        start_rss, peak_rss = rss()
+                        summary['peak_rss_kib'] = peak_rss
+                        summary['rss_growth_kib'] = peak_rss - start_rss if peak_rss and start_rss else None
+                        results[f'{mode}/{size}/{scenario}'] = summary
+                finally:
+                    if process is not None:
+                        process.terminate()
+                        process.wait()
+            app_module.close_all_connections()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'meta': {
+            'python': sys.version.split()[0],
+            'sqlite': sqlite3.sqlite_version,
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+            'workers': args.workers,
+            'threads': args.threads,
+            'group_commit': args.group_commit,
+            'read_cache': not args.no_cache,
+            'json_encoder': args.json_encoder,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+        'results': results,
+    }
+
+# Flag scenarios whose throughput fell, or whose p95, CPU per request or
+# peak RSS rose, beyond tolerance
+def compare(report, baseline, tolerance):
+    regressions = []
+    for key, current in report['results'].items():
+        previous = baseline.get('results', {}).get(key)
+        if not previous:
+            continue
+        if previous.get('requests_per_second') and current.get('requests_per_second') is not None:
+            if current['requests_per_second'] < previous['requests_per_second'] * (1 - tolerance):
+                regressions.append({'scenario': key, 'metric': 'requests_per_second',
+                                    'baseline': previous['requests_per_second'],
+                                    'current': current['requests_per_second']})
+        for metric in ('p95_ms', 'cpu_ms_per_request', 'peak_rss_kib'):
+            if previous.get(metric) and current.get(metric) is not None:
+                if current[metric] > previous[metric] * (1 + tolerance):
+                    regressions.append({'scenario': key, 'metric': metric,
+                                        'baseline': previous[metric], 'current': current[metric]})
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the student endpoints.')
+    parser.add_argument('--sizes', default='10000,100000,1000000',
+                        help='comma-separated roster sizes to seed (default: %(default)s)')
+    parser.add_argument('--mode', choices=('client', 'gunicorn', 'both'), default='client')
+    parser.add_argument('--scenarios', help=f'comma-separated subset of: {", ".join(SCENARIOS)}')
+    parser.add_argument('--requests', type=int, default=500, help='requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker')
+    parser.add_argument('--group-commit', action='store_true', help='enable GROUP_COMMIT (client mode)')
+    parser.add_argument('--no-cache', action='store_true', help='disable the read cache (client mode)')
+    parser.add_argument('--json-encoder', choices=('auto', 'stdlib'), default='auto',
+                        help='JSON_ENCODER for the app under test (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--data-dir', help='keep seeded databases here and reuse them')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--baseline', help='compare against this stored report')
+    parser.add_argument('--save-baseline', help='also store this report as a baseline')
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='allowed relative slowdown before flagging (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['regressions'] = compare(report, json.load(f), args.tolerance)
+        status = 1 if report['regressions'] else 0
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            f.write(output + '\n')
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())